@@ -1,19 +1,21 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.security import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from app.crud.user import UserCRUD
 from app.core.auth import get_current_user
-from app.db.session import get_db
+from app.db.async_session import get_async_db
 from app.schemas.auth import AuthResponse, UserCreate, UserLogin, UserResponse
 
 router = APIRouter()
 
 
 @router.post("/login", response_model=AuthResponse)
-async def login(credentials: UserLogin, db: Session = Depends(get_db)):
-    user = UserCRUD.authenticate_user(db, credentials.username, credentials.password)
+async def login(credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await UserCRUD.authenticate_user(
+        db, credentials.username, credentials.password
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -22,14 +24,16 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id}, expires_delta=access_token_expires
     )
     return {"token": access_token, "user": user}
 
 
 @router.post("/register", response_model=AuthResponse)
-async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
-    user, access_token = UserCRUD.create_user(
+async def register_user(
+    user_data: UserCreate, db: AsyncSession = Depends(get_async_db)
+):
+    user, access_token = await UserCRUD.create_user(
         db, user_data.username, user_data.password
     )
     return {"token": access_token, "user": user}
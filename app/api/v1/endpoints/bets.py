@@ -1,26 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Tuple
+from datetime import date, datetime
 from app.db.session import get_db
 from app.schemas.bet import BetResponse, PlaceBetRequest, UserBetWithGameInfo
-from app.crud.bet import BetCRUD
-from app.core.auth import get_current_user
-from app.models.user import User
+from app.crud.bet import BetCRUD, user_bet_serializer
+from app.core.auth import get_current_principal, Principal
+import base64
 
 router = APIRouter()
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(bet: UserBetWithGameInfo) -> str:
+    raw = f"{bet.placed_at.isoformat()}|{bet.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        placed_at, bet_id = raw.split("|")
+        return datetime.fromisoformat(placed_at), int(bet_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 @router.get("", response_model=List[UserBetWithGameInfo])
 def get_current_user_bets(
-    current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor header from the previous page"
+    ),
+    status: Optional[str] = Query(None, pattern="^(PENDING|WON|LOST|PUSH)$"),
+    start_date: Optional[date] = Query(None, alias="startDate"),
+    end_date: Optional[date] = Query(None, alias="endDate"),
+    current_user: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db),
 ):
-    return BetCRUD.get_user_bets(db, current_user.id)
+    filters = {
+        "status": status,
+        "start_date": start_date,
+        "end_date": end_date,
+        "before": decode_cursor(cursor) if cursor else None,
+    }
+
+    # no paging or filters asked for, every bet as before
+    if limit is None and not any(value is not None for value in filters.values()):
+        bets = BetCRUD.get_user_bets(db, current_user.id)
+        # already validated, skip FastAPI validating and encoding them again
+        return Response(
+            content=user_bet_serializer.dump_json(bets), media_type="application/json"
+        )
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    # one extra bet tells us whether there is a next page
+    bets = BetCRUD.get_user_bets(db, current_user.id, limit + 1, **filters)
+    headers = {}
+    if len(bets) > limit:
+        bets = bets[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(bets[-1])
+    return Response(
+        content=user_bet_serializer.dump_json(bets),
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 @router.post("", response_model=BetResponse)
 def place_bet(
     request: PlaceBetRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db),
 ):
     return BetCRUD.create_bet(db, current_user.id, request)
@@ -1,9 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List, Dict
-from datetime import datetime, timezone, timedelta
-from app.db.session import get_db
-from app.crud.game import GameCRUD
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Optional, Iterator, Tuple
+from datetime import date, datetime, timezone, timedelta
+from app.db.session import get_db, SessionLocal
+from app.db.async_session import get_async_db
+from app.crud.game import GameCRUD, ODDS_FIELDS, game_serializer
+from app.crud.odds_history import OddsHistoryCRUD
+from app.crud.settlement_job import SettlementJobCRUD
+from app.core.cache import todays_odds_cache
+from app.core.http_cache import game_responses
+from app.core.settlement_queue import settlement_queue
+from app.api.v1.endpoints.websocket import odds_manager
 from app.schemas.game import (
     GameResponse,
     GameIdUpdateRequest,
@@ -11,7 +29,13 @@ from app.schemas.game import (
     CurrentGameBettingInfos,
     GameResponse,
     MarkGameEndedResponse,
+    LineMovementResponse,
+    SlateSettlementResponse,
+    SettlementJobResponse,
+    SlateSettlementStatusResponse,
 )
+from pydantic.alias_generators import to_camel
+import base64
 import logging
 from app.models.game import Game
 import pytz
@@ -20,21 +44,105 @@ import pytz
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# rows fetched from the database (and written to the client) at a time when streaming
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(game: GameResponse) -> str:
+    raw = f"{game.game_date.isoformat()}:{game.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        game_date, game_pk = raw.split(":")
+        return date.fromisoformat(game_date), int(game_pk)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def stream_games(filters: dict, limit: Optional[int]) -> Iterator[bytes]:
+    # the request's session is gone by the time the body is streamed
+    db = SessionLocal()
+    try:
+        for games in GameCRUD.iter_games(
+            db, batch_size=STREAM_BATCH_SIZE, limit=limit, **filters
+        ):
+            yield b"".join(
+                game.__pydantic_serializer__.to_json(game, by_alias=True) + b"\n"
+                for game in games
+            )
+    finally:
+        db.close()
+
 
 @router.get("", response_model=List[GameResponse])
-def get_all_games(db: Session = Depends(get_db)):
-    games = GameCRUD.get_all(db)
-    return games
+def get_all_games(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(
+        None, description="X-Next-Cursor header from the previous page"
+    ),
+    start_date: Optional[date] = Query(None, alias="startDate"),
+    end_date: Optional[date] = Query(None, alias="endDate"),
+    has_ended: Optional[bool] = Query(None, alias="hasEnded"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db),
+):
+    filters = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "has_ended": has_ended,
+        "after": decode_cursor(cursor) if cursor else None,
+    }
+
+    # one game per line, for exports of any size
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_games(filters, limit), media_type="application/x-ndjson"
+        )
+
+    # no paging or filters asked for, the whole table as before
+    if limit is None and not any(value is not None for value in filters.values()):
+        return game_responses.respond(
+            request,
+            "all",
+            GameCRUD.get_version(db),
+            lambda: game_serializer.dump_json(GameCRUD.get_responses(db)),
+        )
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    # one extra game tells us whether there is a next page
+    games = GameCRUD.get_page(db, limit + 1, **filters)
+    headers = {}
+    if len(games) > limit:
+        games = games[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(games[-1])
+    return Response(
+        content=game_serializer.dump_json(games),
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 @router.get("/date/{date}", response_model=List[GameResponse])
-def get_games_by_date(date: str, db: Session = Depends(get_db)):
+def get_games_by_date(date: str, request: Request, db: Session = Depends(get_db)):
     try:
         # Parse date string to datetime
         date_obj = datetime.strptime(date, "%Y-%m-%d")
         # Set to start of day in EST
         date_obj = date_obj.replace(tzinfo=timezone.utc)
-        return GameCRUD.get_by_date(db, date_obj)
+        return game_responses.respond(
+            request,
+            f"date:{date_obj.date().isoformat()}",
+            GameCRUD.get_version(db, Game.game_date == date_obj),
+            lambda: game_serializer.dump_json(
+                GameCRUD.get_responses(db, Game.game_date == date_obj)
+            ),
+        )
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
 
@@ -58,58 +166,153 @@ def get_game_by_teams(
 
 
 @router.put("/set-game-id", response_model=GameResponse)
-def set_game_id(request: GameIdUpdateRequest, db: Session = Depends(get_db)):
+def set_game_id(
+    request: GameIdUpdateRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
     try:
         game = GameCRUD.update_game_id(
             db, request.home_team, request.away_team, request.game_date, request.game_id
         )
         if not game:
             raise HTTPException(status_code=404, detail="Game not found")
+        # background tasks run after get_db has committed
+        background_tasks.add_task(odds_manager.publish_games_changed, request.game_date)
         return game
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
 
 
 @router.put("/mark-game-ended/{game_id}", response_model=MarkGameEndedResponse)
-def mark_game_ended(game_id: str, db: Session = Depends(get_db)):
+def mark_game_ended(
+    game_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)
+):
     success = GameCRUD.mark_game_ended(db, game_id)
     if not success:
         raise HTTPException(status_code=404, detail="Game not found")
+    background_tasks.add_task(odds_manager.publish_games_changed)
     return {"success": True}
 
 
-@router.post("/{game_id}/process", response_model=ProcessResponse)
-async def process_game(game_id: str, db: Session = Depends(get_db)):
+@router.post("/{game_id}/process", response_model=ProcessResponse, status_code=202)
+async def process_game(game_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Queue the game's settlement. Asking again returns the same job, and
+    requeues it if the game hadn't ended or it failed"""
     logger.info(f"IN PROCESS GAME. GAME ID IS {game_id}")
+    game_pk = await db.scalar(select(Game.id).where(Game.game_id == game_id))
+    if game_pk is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    job = await db.run_sync(SettlementJobCRUD.enqueue, game_pk)
+    await db.commit()
+    settlement_queue.notify()
+    return {
+        "success": True,
+        "message": f"Settlement job {job.status.lower()}",
+        "game_id": game_id,
+        "job_id": job.id,
+        "job_status": job.status,
+    }
+
+
+@router.get("/settlement-jobs/{job_id}", response_model=SettlementJobResponse)
+async def get_settlement_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    job = await db.run_sync(SettlementJobCRUD.get_status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Settlement job not found")
+    return job._asdict()
+
+
+@router.post(
+    "/date/{date}/process", response_model=SlateSettlementResponse, status_code=202
+)
+async def process_games_by_date(date: str, db: AsyncSession = Depends(get_async_db)):
+    """Queue settlement of every game on the date that still has pending bets,
+    one job per game, as if each were processed on its own"""
     try:
-        game = await GameCRUD.process_game(db, game_id)
-        if game is None:
-            raise HTTPException(
-                status_code=404, detail="Game not found or game did not end"
-            )
+        game_date = datetime.strptime(date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format")
+
+    logger.info(f"IN PROCESS GAMES BY DATE. DATE IS {game_date}")
+    jobs = await db.run_sync(SettlementJobCRUD.enqueue_date, game_date)
+    await db.commit()
+    if jobs:
+        settlement_queue.notify()
+    return {
+        "game_date": game_date,
+        "games": [
+            {
+                "success": True,
+                "message": f"Settlement job {job.status.lower()}",
+                "game_id": game_id,
+                "job_id": job.id,
+                "job_status": job.status,
+            }
+            for game_id, job in jobs
+        ],
+    }
+
+
+@router.get("/date/{date}/settlement", response_model=SlateSettlementStatusResponse)
+async def get_settlement_by_date(date: str, db: AsyncSession = Depends(get_async_db)):
+    """Every settlement job of the date's games, with their results so far"""
+    try:
+        game_date = datetime.strptime(date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format")
 
-        return {
-            "success": True,
-            "message": "Game processed successfully",
-            "game_id": game_id,
-        }
-    except Exception as e:
-        logger.error(f"Error processing game {game_id}: {str(e)}")
-        return {
-            "success": False,
-            "message": f"Failed to process game: {str(e)}",
-            "game_id": game_id,
-        }
+    jobs = await db.run_sync(SettlementJobCRUD.get_date_status, game_date)
+    return {"game_date": game_date, "games": [job._asdict() for job in jobs]}
 
 
 @router.get("/today", response_model=CurrentGameBettingInfos)
-def get_todays_odds(db: Session = Depends(get_db)):
-    betting_infos = GameCRUD.get_todays_odds(db)
-    print(betting_infos)
-    print(f"\n\n")
+def get_todays_odds(request: Request, db: Session = Depends(get_db)):
+    # the tag comes with the slate it was loaded for, so a rollover or
+    # invalidation can't pair one day's body with another's tag
+    version, betting_infos = todays_odds_cache.get_tagged(db)
     if not betting_infos:
         raise HTTPException(status_code=500, detail="Return object was None")
-    return betting_infos
+    return game_responses.respond(
+        request,
+        "today",
+        version,
+        lambda: betting_infos.__pydantic_serializer__.to_json(
+            betting_infos, by_alias=True
+        ),
+    )
+
+
+@router.get("/{game_id}/line-movement", response_model=LineMovementResponse)
+def get_line_movement(
+    game_id: str,
+    points: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = Query(
+        None, description="Comma separated, eg. homeSpread,overUnder. Defaults to all"
+    ),
+    db: Session = Depends(get_db),
+):
+    game = GameCRUD.get_by_game_id(db, game_id)
+    if not game:
+        raise HTTPException(
+            status_code=404, detail=f"Game not found with id: {game_id}"
+        )
+
+    field_names = {to_camel(field): field for field in ODDS_FIELDS}
+    if fields:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in requested if f not in field_names]
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown fields: {', '.join(unknown)}"
+            )
+        selected = [field_names[f] for f in requested]
+    else:
+        selected = list(ODDS_FIELDS)
+
+    series = OddsHistoryCRUD.get_line_movement(db, game.id, points, selected)
+    return {"game_id": game_id, "points": series}
 
 
 @router.get("/{game_id}", response_model=GameResponse)
@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from app.core.cache import todays_odds_cache
+from app.core.http_cache import game_responses
+from app.core.security import password_hasher
+from app.api.v1.endpoints.odds import odds_coalescer
+from app.api.v1.endpoints.websocket import odds_manager
+
+# mounted behind require_internal_token, see app.main
+router = APIRouter()
+
+
+@router.get("/stats/websocket")
+def websocket_stats():
+    return odds_manager.stats()
+
+
+@router.get("/stats/notify-odds")
+def notify_odds_stats():
+    return odds_coalescer.stats()
+
+
+@router.get("/stats/todays-odds-cache")
+def todays_odds_cache_stats():
+    return {**todays_odds_cache.stats(), "responses": game_responses.stats()}
+
+
+@router.get("/stats/password-hashing")
+def password_hashing_stats():
+    return password_hasher.stats()
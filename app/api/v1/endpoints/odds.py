@@ -1,65 +1,190 @@
 from app.api.v1.endpoints.websocket import odds_manager
-from sqlalchemy.orm import Session
-from app.schemas.odds import UpdateOddsRequest, UpdateOddsByTeamsRequest
-from app.schemas.game import GameResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.odds import (
+    UpdateOddsRequest,
+    UpdateOddsByTeamsRequest,
+    BatchUpdateOddsRequest,
+    IngestOddsRequest,
+)
 from fastapi import APIRouter, Depends, HTTPException
-from app.db.session import get_db
+from app.db.async_session import get_async_db, AsyncSessionLocal
 from app.models.game import Game
+from app.crud.game import GameCRUD, ODDS_FIELDS, game_serializer
+from app.crud.odds_history import OddsHistoryCRUD
+from app.websockets.coalescer import NotificationCoalescer
 from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
+odds_coalescer = NotificationCoalescer()
+
+
+async def broadcast_game_by_id(db: AsyncSession, game_id: str) -> bool:
+    """Read a game and broadcast its odds. Returns False if it doesn't exist"""
+    game_models = await db.run_sync(
+        GameCRUD.get_responses, Game.game_id == game_id, limit=1
+    )
+    if not game_models:
+        return False
+    await db.run_sync(OddsHistoryCRUD.record_games, game_models)
+    # commit before broadcasting so clients never see odds that get rolled back
+    await db.commit()
+
+    logger.debug("BROADCAST UPDATED ODDS TO REACT NOW...")
+    # Broadcast update to all connected clients
+    await odds_manager.broadcast_odds_update(
+        game_id=game_id,
+        # Convert to dict with aliased field names, already JSON-safe so the
+        # frame encoder never has to fall back to Python for Decimals/dates
+        game_data=game_serializer.dump_jsonable(game_models)[0],
+    )
+    return True
+
+
+async def broadcast_game_by_teams(
+    db: AsyncSession, home_team: str, away_team: str, game_date: str
+) -> bool:
+    date_obj = datetime.strptime(game_date, "%Y-%m-%d")
+    game_models = await db.run_sync(
+        GameCRUD.get_responses,
+        away_team == Game.away_team,
+        home_team == Game.home_team,
+        date_obj == Game.game_date,
+        limit=1,
+    )
+    if not game_models:
+        return False
+    await db.run_sync(OddsHistoryCRUD.record_games, game_models)
+    await db.commit()
+
+    logger.debug("TEAMS AND GAME DATE NOT NULL, BROADCASTING TO REACT...")
+    # Broadcast update to all connected clients
+    await odds_manager.broadcast_odds_update_by_teams(
+        home_team=home_team,
+        away_team=away_team,
+        game_date=game_date,
+        game_data=game_serializer.dump_jsonable(game_models)[0],
+    )
+    return True
+
+
+async def _flush(broadcast, *args):
+    # coalesced flushes run after the request is gone, so they need their own session
+    async with AsyncSessionLocal() as db:
+        try:
+            if not await broadcast(db, *args):
+                logger.warning(f"COALESCED ODDS UPDATE FOR {args}: GAME NOT FOUND")
+        except:
+            await db.rollback()
+            raise
 
 
 @router.post("/notify-odds-update")
-async def update_odds(request: UpdateOddsRequest, db: Session = Depends(get_db)):
-    print(f"IN NOTIFYODDS UPDATE BY GAMEID {request.game_id}")
+async def update_odds(
+    request: UpdateOddsRequest, db: AsyncSession = Depends(get_async_db)
+):
+    logger.debug(f"IN NOTIFYODDS UPDATE BY GAMEID {request.game_id}")
     if request.game_id:
-        game_model = db.query(Game).filter(Game.game_id == request.game_id).first()
-        if not game_model:
-            raise HTTPException(status_code=404, detail="Game not found")
-
-        # Convert SQLAlchemy model to Pydantic model
-        game_data = GameResponse.model_validate(game_model)
+        if odds_coalescer.enabled:
+            merged = odds_coalescer.submit(
+                request.game_id,
+                lambda: _flush(broadcast_game_by_id, request.game_id),
+            )
+            return {"status": "success", "coalesced": merged}
 
-        print(f"BROADCAST UPDATED ODDS TO REACT NOW...")
-        # Broadcast update to all connected clients
-        await odds_manager.broadcast_odds_update(
-            game_id=request.game_id,
-            game_data=game_data.model_dump(
-                by_alias=True
-            ),  # Convert to dict with aliased field names
-        )
+        if not await broadcast_game_by_id(db, request.game_id):
+            raise HTTPException(status_code=404, detail="Game not found")
 
     return {"status": "success"}
 
 
 @router.post("/notify-odds-by-teams")
 async def update_odds_by_teams(
-    request: UpdateOddsByTeamsRequest, db: Session = Depends(get_db)
+    request: UpdateOddsByTeamsRequest, db: AsyncSession = Depends(get_async_db)
 ):
-    print(
+    logger.debug(
         f"IN NOTIFY ODDS BY TEAMS: {request.away_team} AT {request.home_team} ON {request.game_date}"
     )
     if request.away_team and request.home_team and request.game_date:
-        date_obj = datetime.strptime(request.game_date, "%Y-%m-%d")
-        game_model = (
-            db.query(Game)
-            .filter(
-                request.away_team == Game.away_team,
-                request.home_team == Game.home_team,
-                date_obj == Game.game_date,
+        args = (request.home_team, request.away_team, request.game_date)
+        if odds_coalescer.enabled:
+            merged = odds_coalescer.submit(
+                args, lambda: _flush(broadcast_game_by_teams, *args)
             )
-            .first()
-        )
-        # Convert SQLAlchemy model to Pydantic model
-        game_data = GameResponse.model_validate(game_model)
-        print(f"TEAMS AND GAME DATE NOT NULL, BROADCASTING TO REACT...")
-        # Broadcast update to all connected clients
-        await odds_manager.broadcast_odds_update_by_teams(
-            home_team=request.home_team,
-            away_team=request.away_team,
-            game_date=request.game_date,
-            game_data=game_data.model_dump(by_alias=True),
-        )
+            return {"status": "success", "coalesced": merged}
+
+        if not await broadcast_game_by_teams(db, *args):
+            raise HTTPException(status_code=404, detail="Game not found")
 
     return {"status": "success"}
+
+
+@router.post("/notify-odds-batch")
+async def update_odds_batch(
+    request: BatchUpdateOddsRequest, db: AsyncSession = Depends(get_async_db)
+):
+    logger.debug(
+        f"IN NOTIFY ODDS BATCH: {len(request.game_ids)} GAME IDS, {len(request.games)} BY TEAMS"
+    )
+    teams_and_dates = [(g.home_team, g.away_team, g.game_date) for g in request.games]
+    game_models = await db.run_sync(
+        GameCRUD.get_many, request.game_ids, teams_and_dates
+    )
+    await db.run_sync(OddsHistoryCRUD.record_games, game_models)
+    await db.commit()
+
+    games = game_serializer.dump_jsonable(game_models)
+    if games:
+        await odds_manager.broadcast_odds_batch_update(games)
+
+    found_ids = {game.game_id for game in game_models}
+    found_teams = {(g.home_team, g.away_team, g.game_date) for g in game_models}
+    return {
+        "status": "success",
+        "broadcast": len(games),
+        "missingGameIds": [i for i in request.game_ids if i not in found_ids],
+        "missingGames": [
+            g.model_dump(mode="json", by_alias=True)
+            for g in request.games
+            if (g.home_team, g.away_team, g.game_date) not in found_teams
+        ],
+    }
+
+
+@router.post("/ingest-odds")
+async def ingest_odds(
+    request: IngestOddsRequest, db: AsyncSession = Depends(get_async_db)
+):
+    """Write new odds for many games and broadcast them, without reading the
+    rows back afterwards"""
+    logger.debug(f"IN INGEST ODDS: {len(request.games)} GAMES")
+    updated = await db.run_sync(GameCRUD.bulk_update_odds, request.games)
+    game_models = game_serializer.validate(game for game, _ in updated)
+    await db.run_sync(
+        OddsHistoryCRUD.record_changes,
+        (
+            (game.id, previous, {field: getattr(game, field) for field in ODDS_FIELDS})
+            for game, previous in updated
+        ),
+    )
+    # commit before broadcasting so clients never see odds that get rolled back
+    await db.commit()
+
+    games = game_serializer.dump_jsonable(game_models)
+    if games:
+        await odds_manager.broadcast_odds_batch_update(games)
+
+    found_ids = {game.game_id for game in game_models if game.game_id}
+    found_teams = {(g.home_team, g.away_team, g.game_date) for g in game_models}
+    return {
+        "status": "success",
+        "updated": len(games),
+        "missing": [
+            item.model_dump(mode="json", by_alias=True, exclude_none=True)
+            for item in request.games
+            if item.game_id not in found_ids
+            and (item.home_team, item.away_team, item.game_date) not in found_teams
+        ],
+    }
@@ -2,7 +2,7 @@ from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from app.crud.user import UserCRUD
-from app.core.auth import get_current_user
+from app.core.auth import get_current_principal, Principal
 from app.db.session import get_db
 from app.schemas.user import DepositRequest, DepositResponse, UserResponse
 from app.models.user import User
@@ -13,7 +13,7 @@ router = APIRouter()
 @router.post("/deposit", response_model=DepositResponse)
 def deposit(
     request: DepositRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db),
 ):
     return {"success": UserCRUD.deposit(db, current_user.username, request.amount)}
@@ -21,8 +21,8 @@ def deposit(
 
 @router.get("/", response_model=UserResponse)
 def get_user(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db),
 ):
-    user = UserCRUD.get_user_by_username(db, current_user.username)
+    user = db.get(User, current_user.id)
     return user
@@ -28,6 +28,7 @@ async def websocket_endpoint(websocket: WebSocket):
         try:
             while True:
                 data = await websocket.receive_text()
+                await odds_manager.handle_client_message(websocket, data)
         except WebSocketDisconnect:
             await odds_manager.disconnect(websocket)
         except Exception as e:
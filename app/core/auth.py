@@ -1,18 +1,80 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.security import SECRET_KEY, ALGORITHM
-from app.db.session import get_db
+from app.db.async_session import get_async_db
 from app.crud.user import UserCRUD
-from typing import Optional
+from app.models.user import User
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import os
+import secrets
+import threading
+import time
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# Seconds a decoded token is remembered (never past the token's own expiry)
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+# Most decoded tokens remembered per worker
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+# Bearer token for the /api/internal routes (connection, queue and cache
+# stats). They're turned off while it isn't set
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Who a request is from. Holds nothing a write can change, so routes that
+    only need to know the user don't have to load the row"""
+
+    id: int
+    username: str
+
+
+class PrincipalCache:
+    """LRU of bearer token -> Principal with a short TTL"""
+
+    def __init__(self, ttl: float = AUTH_CACHE_TTL, max_size: int = AUTH_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        # token -> (principal, monotonic expiry)
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        # sync routes resolve their dependencies on the threadpool too
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            self._entries.move_to_end(token)
+            return entry[0]
+
+    def put(self, token: str, principal: Principal, token_expires_at: Optional[float]):
+        expires = time.monotonic() + self.ttl
+        if token_expires_at is not None:
+            # jwt exp is wall clock time
+            expires = min(expires, time.monotonic() + token_expires_at - time.time())
+        with self._lock:
+            self._entries[token] = (principal, expires)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+principal_cache = PrincipalCache()
+
+
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
 
-async def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -26,7 +88,43 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = UserCRUD.get_user_by_username(db, username)
+    user_id = payload.get("uid")
+    if user_id is None:
+        # tokens issued before the user id was added to the claims
+        user = await db.run_sync(UserCRUD.get_user_by_username, username)
+        if user is None:
+            raise credentials_exception
+        user_id, username = user.id, user.username
+
+    principal = Principal(id=user_id, username=username)
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    """The full user row, for routes that need more than who the user is"""
+    user = await db.get(User, principal.id)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
+
+
+def require_internal_token(authorization: Optional[str] = Header(None)):
+    """For operators' routes, not users': the INTERNAL_API_TOKEN bearer"""
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not secrets.compare_digest(
+        (authorization or "").encode(), f"Bearer {INTERNAL_API_TOKEN}".encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,184 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+from pydantic import ValidationError
+from app.schemas.bet import BoxscoreScore, BoxscoreScoreDocument
+import asyncio
+import logging
+import os
+import random
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# where boxscores are fetched from, eg. a local stand-in when testing
+NBA_CDN_URL = os.getenv("NBA_CDN_URL", "https://cdn.nba.com")
+# Most keep-alive connections to the CDN
+BOXSCORE_CONNECTIONS = int(os.getenv("BOXSCORE_CONNECTIONS", "20"))
+# Seconds for a whole request, including reading the body
+BOXSCORE_TIMEOUT = float(os.getenv("BOXSCORE_TIMEOUT", "10"))
+# Extra attempts after a timeout, connection error, 429 or 5xx
+BOXSCORE_RETRIES = int(os.getenv("BOXSCORE_RETRIES", "3"))
+# Most parsed boxscores kept for conditional requests
+BOXSCORE_CACHE_SIZE = int(os.getenv("BOXSCORE_CACHE_SIZE", "64"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_score(body: bytes) -> BoxscoreScore:
+    # validated straight from the bytes: pydantic's parser skips over the
+    # players and statistics without building Python objects for them
+    return BoxscoreScoreDocument.model_validate_json(body).game
+
+
+async def read_score(response: aiohttp.ClientResponse) -> BoxscoreScore:
+    return parse_score(await response.read())
+
+
+@dataclass
+class CachedBoxscore:
+    value: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class BoxscoreClient:
+    """Fetches boxscores from the NBA CDN over one pooled keep-alive session.
+
+    The last boxscore of recently fetched games is kept along with its
+    validators, so asking again sends If-None-Match/If-Modified-Since and an
+    unchanged game costs a 304 instead of a full download.
+
+    `get_score` keeps only the status and scores, skipping the players and
+    statistics.
+    """
+
+    def __init__(
+        self,
+        base_url: str = NBA_CDN_URL,
+        connections: int = BOXSCORE_CONNECTIONS,
+        timeout: float = BOXSCORE_TIMEOUT,
+        retries: int = BOXSCORE_RETRIES,
+        cache_size: int = BOXSCORE_CACHE_SIZE,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.connections = connections
+        self.timeout = timeout
+        self.retries = retries
+        self.cache_size = cache_size
+        self._session: Optional[aiohttp.ClientSession] = None
+        # (game_id, what was parsed) -> last response
+        self._cache: "OrderedDict[Tuple[str, str], CachedBoxscore]" = OrderedDict()
+
+        self.requests = 0
+        self.not_modified = 0
+        self.retried = 0
+
+    async def start(self):
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.connections, ttl_dns_cache=300, keepalive_timeout=60
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def url(self, game_id: str) -> str:
+        return f"{self.base_url}/static/json/liveData/boxscore/boxscore_{game_id}.json"
+
+    async def get_score(self, game_id: str) -> Optional[BoxscoreScore]:
+        """Just the game's status and team scores, or None if they can't be
+        fetched"""
+        return await self._fetch(game_id, "score", read_score)
+
+    async def _fetch(
+        self,
+        game_id: str,
+        kind: str,
+        read: Callable[[aiohttp.ClientResponse], Awaitable[Any]],
+    ) -> Optional[Any]:
+        # started in the app lifespan, scripts get one on first use
+        await self.start()
+        key = (game_id, kind)
+        cached = self._cache.get(key)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                # full jitter, so retries from many games don't line up
+                await asyncio.sleep(random.uniform(0, min(4.0, 0.25 * 2**attempt)))
+            try:
+                self.requests += 1
+                async with self._session.get(
+                    self.url(game_id), headers=headers
+                ) as response:
+                    if response.status == 304 and cached is not None:
+                        self.not_modified += 1
+                        self._cache.move_to_end(key)
+                        return cached.value
+                    if response.status in RETRY_STATUSES:
+                        logger.warning(
+                            f"Boxscore for game_id {game_id}: Status {response.status}, attempt {attempt + 1}"
+                        )
+                        continue
+                    if response.status != 200:
+                        logger.error(
+                            f"Failed to fetch boxscore for game_id {game_id}: Status {response.status}"
+                        )
+                        return None
+                    try:
+                        value = await read(response)
+                    except (ValidationError, ValueError, KeyError) as e:
+                        logger.error(f"Bad boxscore for game_id {game_id}: {e!r}")
+                        return None
+                    self._remember(
+                        key,
+                        CachedBoxscore(
+                            value,
+                            response.headers.get("ETag"),
+                            response.headers.get("Last-Modified"),
+                        ),
+                    )
+                    return value
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(
+                    f"Boxscore for game_id {game_id}: {e!r}, attempt {attempt + 1}"
+                )
+
+        logger.error(
+            f"Failed to fetch boxscore for game_id {game_id} after {self.retries + 1} attempts"
+        )
+        return None
+
+    def _remember(self, key: Tuple[str, str], entry: CachedBoxscore):
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "retried": self.retried,
+            "cached": len(self._cache),
+        }
+
+
+boxscore_client = BoxscoreClient()
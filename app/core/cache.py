@@ -0,0 +1,105 @@
+from typing import Any, Dict, Optional, Tuple, Union
+from datetime import date, datetime
+from sqlalchemy.orm import Session
+from app.crud.game import GameCRUD, EASTERN
+from app.schemas.game import CurrentGameBettingInfos
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class TodaysOddsCache:
+    """Holds the assembled /api/games/today response until the slate rolls
+    over at 2 AM Eastern or a game on it changes.
+
+    Changes reach every worker through the odds broadcast bus, which calls
+    `invalidate` once the change has been committed.
+    """
+
+    def __init__(self):
+        self.value: Optional[CurrentGameBettingInfos] = None
+        self.slate_date: Optional[date] = None
+        self.expires_at: Optional[datetime] = None
+        # (tag, value, expires_at) of the cached slate, swapped as a whole
+        self._entry: Optional[Tuple[str, CurrentGameBettingInfos, datetime]] = None
+        # bumped on every invalidation, so a load that raced one isn't stored
+        self.version = 0
+        self._load_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, db: Session) -> CurrentGameBettingInfos:
+        return self.get_tagged(db)[1]
+
+    def get_tagged(self, db: Session) -> Tuple[str, CurrentGameBettingInfos]:
+        """The slate and a tag that changes whenever it does: the version and
+        slate date it was loaded under, taken together with it"""
+        entry = self._current()
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        # only one request rebuilds the slate, the rest wait for its result
+        with self._load_lock:
+            entry = self._current()
+            if entry is not None:
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            version = self.version
+            slate_date = GameCRUD.get_slate_date()
+            value = GameCRUD.get_todays_odds(db)
+            tag = f"{version}:{slate_date}"
+            if version == self.version:
+                self.value = value
+                self.slate_date = slate_date
+                self.expires_at = GameCRUD.get_slate_rollover(slate_date)
+                self._entry = (tag, value, self.expires_at)
+            return tag, value
+
+    def _current(self) -> Optional[Tuple[str, CurrentGameBettingInfos]]:
+        # one read, so the tag always belongs to the value
+        entry = self._entry
+        if entry is None or datetime.now(EASTERN) >= entry[2]:
+            return None
+        return entry[0], entry[1]
+
+    def invalidate(self, game_date: Union[date, str, None] = None):
+        """Drop the cached slate. A game dated before the slate can't be on
+        it, so changes to those are ignored."""
+        if isinstance(game_date, str):
+            game_date = date.fromisoformat(game_date[:10])
+        if (
+            game_date is not None
+            and self.slate_date is not None
+            and game_date < self.slate_date
+        ):
+            return
+        self.version += 1
+        self.invalidations += 1
+        self.value = None
+        self._entry = None
+
+    def warm(self, db: Session):
+        try:
+            self.get(db)
+        except Exception as e:
+            logger.error(f"Could not warm today's odds cache: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": self.value is not None,
+            "slate_date": self.slate_date.isoformat() if self.slate_date else None,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+todays_odds_cache = TodaysOddsCache()
@@ -0,0 +1,146 @@
+from typing import Any, Iterable, Sequence
+from dataclasses import dataclass
+from decimal import Decimal
+from sqlalchemy import BigInteger, cast, func
+from app.models.bet import Bet, BetType
+import numpy as np
+
+# outcome codes, index into STATUSES
+PENDING, LOST, WON, PUSH = range(4)
+STATUSES = ("PENDING", "LOST", "WON", "PUSH")
+
+# bet type codes, index into BET_TYPES
+BET_TYPES = tuple(BetType)
+BET_TYPE_CODES = {bet_type: code for code, bet_type in enumerate(BET_TYPES)}
+SPREAD_HOME, SPREAD_AWAY, MONEYLINE_HOME, MONEYLINE_AWAY, OVER, UNDER = (
+    BET_TYPE_CODES[bet_type]
+    for bet_type in (
+        BetType.SPREAD_HOME,
+        BetType.SPREAD_AWAY,
+        BetType.MONEYLINE_HOME,
+        BetType.MONEYLINE_AWAY,
+        BetType.OVER,
+        BetType.UNDER,
+    )
+)
+
+
+def hundredths(column):
+    # rounded first, SQLite may hand back 0.29 * 100 as 28.999...
+    return cast(func.round(column * 100), BigInteger)
+
+
+# what BetColumns.from_rows takes, money and lines already in hundredths
+BET_COLUMNS = (
+    Bet.user_id,
+    Bet.bet_type,
+    hundredths(Bet.betting_line),
+    hundredths(Bet.amount_placed),
+    hundredths(Bet.total_payout),
+)
+
+
+def to_hundredths(value: Any) -> int:
+    """Numeric(_, 2) money or line as an exact integer"""
+    return int(Decimal(value).scaleb(2))
+
+
+def from_hundredths(value: int) -> Decimal:
+    return Decimal(int(value)).scaleb(-2)
+
+
+@dataclass
+class BetColumns:
+    """A game's bets as parallel arrays. Lines and money are in hundredths,
+    so grading and summing are exact integer math."""
+
+    user_id: np.ndarray
+    bet_type: np.ndarray
+    # 0 where the bet has no line
+    line: np.ndarray
+    has_line: np.ndarray
+    amount_placed: np.ndarray
+    total_payout: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence[Any]]) -> "BetColumns":
+        """From rows of BET_COLUMNS"""
+        columns = list(zip(*rows)) or [()] * 5
+        user_id, bet_type, line, amount_placed, total_payout = columns
+        return cls(
+            user_id=np.array(user_id, np.int64),
+            bet_type=np.array([BET_TYPE_CODES[code] for code in bet_type], np.int8),
+            line=np.array([value or 0 for value in line], np.int64),
+            has_line=np.array([value is not None for value in line], bool),
+            amount_placed=np.array(amount_placed, np.int64),
+            total_payout=np.array(total_payout, np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.user_id)
+
+
+@dataclass
+class UserCredits:
+    """What each user with something to collect is owed, in hundredths"""
+
+    user_id: np.ndarray
+    amount_won: np.ndarray
+    bets_won: np.ndarray
+    credit: np.ndarray
+
+
+def grade(bets: BetColumns, home_score: int, away_score: int) -> np.ndarray:
+    """Outcome code per bet, following BetCRUD.process_bet's rules: spreads
+    never push, a total equal to the line pushes, a tied game loses both
+    moneylines. Spread and total bets without a line can't be graded, so
+    they stay PENDING."""
+    home, away = home_score * 100, away_score * 100
+    total = home + away
+    bet_type, line = bets.bet_type, bets.line
+
+    # how much the side that was bet on won by
+    margin = np.where(bet_type == SPREAD_HOME, home - away, away - home)
+    is_spread = (bet_type == SPREAD_HOME) | (bet_type == SPREAD_AWAY)
+    is_total = (bet_type == OVER) | (bet_type == UNDER)
+    won = (
+        (
+            is_spread
+            & (((line > 0) & (margin + line > 0)) | ((line < 0) & (margin >= -line)))
+        )
+        | ((bet_type == OVER) & (total > line))
+        | ((bet_type == UNDER) & (total < line))
+        | ((bet_type == MONEYLINE_HOME) & (home > away))
+        | ((bet_type == MONEYLINE_AWAY) & (away > home))
+    )
+    push = is_total & (total == line)
+
+    outcome = np.full(len(bets), LOST, np.int8)
+    outcome[push] = PUSH
+    outcome[won] = WON
+    outcome[(is_spread | is_total) & ~bets.has_line] = PENDING
+    return outcome
+
+
+def credit_totals(bets: BetColumns, outcome: np.ndarray) -> UserCredits:
+    """Per-user sums for graded bets: winners get their payout, pushes their
+    stake back. Users with nothing to collect are left out."""
+    won = outcome == WON
+    amount_won = np.where(won, bets.total_payout, 0)
+    credit = np.where(outcome == PUSH, bets.amount_placed, amount_won)
+    owed = won | (credit != 0)
+    if not owed.any():
+        empty = np.empty(0, np.int64)
+        return UserCredits(empty, empty, empty, empty)
+
+    # group by user with one sort, sums stay exact int64
+    user_id = bets.user_id[owed]
+    order = np.argsort(user_id, kind="stable")
+    user_id = user_id[order]
+    starts = np.flatnonzero(np.r_[True, user_id[1:] != user_id[:-1]])
+    return UserCredits(
+        user_id=user_id[starts],
+        amount_won=np.add.reduceat(amount_won[owed][order], starts),
+        bets_won=np.add.reduceat(won[owed][order].astype(np.int64), starts),
+        credit=np.add.reduceat(credit[owed][order], starts),
+    )
@@ -0,0 +1,145 @@
+from typing import Callable, Dict, Optional
+from collections import OrderedDict
+from fastapi import Request, Response
+import gzip
+import hashlib
+import os
+import threading
+
+# Most resources (eg. /api/games/date/{date} for different dates) to keep
+# encoded bodies for
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "256"))
+# Bodies smaller than this aren't worth compressing
+HTTP_CACHE_GZIP_MIN_BYTES = int(os.getenv("HTTP_CACHE_GZIP_MIN_BYTES", "500"))
+
+
+class EncodedBody:
+    """A JSON body encoded once, with its gzip variant built on first use"""
+
+    __slots__ = ("version", "identity", "etag", "gzip_etag", "_gzip")
+
+    def __init__(self, version: str, identity: bytes):
+        self.version = version
+        self.identity = identity
+        # taken from the content, so every worker hands out the same ETag
+        digest = hashlib.blake2b(identity, digest_size=16).hexdigest()
+        self.etag = f'"{digest}"'
+        # each encoding is its own representation, with its own strong ETag
+        self.gzip_etag = f'"{digest}-gz"'
+        self._gzip: Optional[bytes] = None
+
+    @property
+    def gzip(self) -> bytes:
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.identity, compresslevel=6)
+        return self._gzip
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00")
+    return False
+
+
+class ResponseCache:
+    """Pre-encoded JSON bodies for read endpoints that many clients poll.
+
+    Each resource is identified by a key and a version string that changes
+    whenever its content does. The body is only rebuilt when the version
+    moves on, and a client that already has it gets a 304.
+    """
+
+    def __init__(self, max_entries: int = HTTP_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, EncodedBody]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # bumped by invalidate(), for changes the version strings can't see
+        # (eg. odds written straight to the table by the scraper)
+        self.generation = 0
+
+        self.not_modified = 0
+        self.hits = 0
+        self.builds = 0
+        self.invalidations = 0
+
+    def respond(
+        self, request: Request, key: str, version: str, build: Callable[[], bytes]
+    ) -> Response:
+        # read before building, so an invalidation during the build only
+        # costs another rebuild
+        version = f"{self.generation}:{version}"
+        entry = self._get(key, version)
+        if entry is None:
+            entry = EncodedBody(version, build())
+            self.builds += 1
+            self._put(key, entry)
+        else:
+            self.hits += 1
+
+        body, etag = entry.identity, entry.etag
+        encoding = None
+        if len(body) >= HTTP_CACHE_GZIP_MIN_BYTES and _accepts_gzip(
+            request.headers.get("accept-encoding")
+        ):
+            body, etag, encoding = entry.gzip, entry.gzip_etag, "gzip"
+
+        headers = {
+            "ETag": etag,
+            # clients may keep the body but must revalidate it every time
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self):
+        """Rebuild every body on its next request"""
+        self.generation += 1
+        self.invalidations += 1
+
+    def _get(self, key: str, version: str) -> Optional[EncodedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: str, entry: EncodedBody):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "builds": self.builds,
+            "not_modified": self.not_modified,
+            "generation": self.generation,
+            "invalidations": self.invalidations,
+        }
+
+
+game_responses = ResponseCache()
@@ -1,8 +1,11 @@
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,6 +17,14 @@ SECRET_KEY = os.getenv("SECRET")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
+# bcrypt releases the GIL, so hashing threads run on separate cores
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 1)))
+# Most logins/registrations waiting for a hashing thread before new ones are
+# turned away
+BCRYPT_MAX_WAITING = int(os.getenv("BCRYPT_MAX_WAITING", "64"))
+# Seconds a login/registration may wait for a hashing thread
+BCRYPT_QUEUE_TIMEOUT = float(os.getenv("BCRYPT_QUEUE_TIMEOUT", "5"))
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +34,106 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class HasherBusy(Exception):
+    """Too many hashes are queued, or one waited too long for a thread"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool so it never blocks the event loop.
+
+    At most `workers` hashes run at once. Callers beyond that wait their turn,
+    unless `max_waiting` are waiting already or `queue_timeout` passes, in
+    which case HasherBusy is raised.
+    """
+
+    def __init__(
+        self,
+        workers: int = BCRYPT_WORKERS,
+        max_waiting: int = BCRYPT_MAX_WAITING,
+        queue_timeout: float = BCRYPT_QUEUE_TIMEOUT,
+    ):
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bcrypt"
+        )
+        self._slots = asyncio.Semaphore(workers)
+
+        self.waiting = 0
+        self.running = 0
+        self.hashes = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.hash_seconds = 0.0
+        self.max_hash_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def _run(self, fn: Callable[..., Any], *args) -> Any:
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise HasherBusy("Too many password hashes queued")
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise HasherBusy("Timed out waiting to hash password")
+        finally:
+            self.waiting -= 1
+
+        started = time.perf_counter()
+        self._record_wait(started - queued_at)
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, fn, *args
+            )
+        finally:
+            self.running -= 1
+            self._slots.release()
+            self._record_hash(time.perf_counter() - started)
+
+    def _record_wait(self, seconds: float):
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def _record_hash(self, seconds: float):
+        self.hashes += 1
+        self.hash_seconds += seconds
+        self.max_hash_seconds = max(self.max_hash_seconds, seconds)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        started = self.hashes + self.running
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "waiting": self.waiting,
+            "hashes": self.hashes,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_hash_ms": self.hash_seconds / self.hashes * 1000 if self.hashes else 0,
+            "max_hash_ms": self.max_hash_seconds * 1000,
+            "avg_queue_wait_ms": (self.wait_seconds / started * 1000 if started else 0),
+            "max_queue_wait_ms": self.max_wait_seconds * 1000,
+        }
+
+
+password_hasher = PasswordHasher()
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
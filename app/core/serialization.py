@@ -0,0 +1,40 @@
+from typing import Any, Generic, Iterable, List, Sequence, Type, TypeVar
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import Row, Select, select
+from sqlalchemy.sql import ColumnElement
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class RowSerializer(Generic[M]):
+    """Turns database rows into a response model's aliased JSON in bulk.
+
+    Queries select just the model's columns as plain rows (no ORM objects),
+    whole lists are validated in one TypeAdapter call and dumped straight to
+    aliased JSON bytes.
+    """
+
+    def __init__(self, model: Type[M], columns: Sequence[ColumnElement]):
+        self.model = model
+        self.columns = tuple(columns)
+        self.adapter = TypeAdapter(List[model])
+
+    @classmethod
+    def for_table(cls, model: Type[M], table: Any) -> "RowSerializer[M]":
+        """For a model whose fields are all columns of the same name"""
+        return cls(model, [getattr(table, name) for name in model.model_fields])
+
+    def select(self) -> Select:
+        return select(*self.columns)
+
+    def validate(self, rows: Iterable[Row]) -> List[M]:
+        # plain dicts validate several times faster than RowMapping or
+        # attribute access, and faster than model_construct()
+        return self.adapter.validate_python([row._asdict() for row in rows])
+
+    def dump_json(self, models: List[M]) -> bytes:
+        return self.adapter.dump_json(models, by_alias=True)
+
+    def dump_jsonable(self, models: List[M]) -> List[dict]:
+        """JSON-safe dicts, eg. for broadcast payloads"""
+        return self.adapter.dump_python(models, mode="json", by_alias=True)
@@ -0,0 +1,159 @@
+from typing import Awaitable, Callable, List, Optional
+from datetime import date
+from app.crud.game import GameCRUD
+from app.crud.settlement_job import SettlementJobCRUD
+from app.db.async_session import AsyncSessionLocal
+from app.models.game import Game
+from app.models.settlement_job import SettlementJob
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# settlement jobs run at once per process, so a slate's games settle side by
+# side. Each holds an async pool connection only while it grades a batch, so
+# keep this under the pool size
+SETTLE_WORKERS = int(os.getenv("SETTLE_WORKERS", "8"))
+# bets graded per transaction, each one is a checkpoint
+SETTLE_BATCH_SIZE = int(os.getenv("SETTLE_BATCH_SIZE", "5000"))
+# seconds an idle worker waits before looking for jobs queued by other processes
+SETTLE_POLL_SECONDS = float(os.getenv("SETTLE_POLL_SECONDS", "5"))
+# seconds without a checkpoint before a running job is taken over
+SETTLE_STALE_SECONDS = float(os.getenv("SETTLE_STALE_SECONDS", "120"))
+
+
+class SettlementQueue:
+    """Background workers that run queued settlement jobs.
+
+    The settlement_jobs table is the queue, so jobs survive restarts and are
+    shared by every worker process: a job is claimed with SKIP LOCKED, graded
+    in batches that each commit a checkpoint, and a job whose worker stops
+    checking in is taken over and resumed from its last checkpoint.
+    """
+
+    def __init__(
+        self,
+        workers: int = SETTLE_WORKERS,
+        batch_size: int = SETTLE_BATCH_SIZE,
+        poll_seconds: float = SETTLE_POLL_SECONDS,
+        stale_seconds: float = SETTLE_STALE_SECONDS,
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        # called with the game date after a game is settled
+        self._on_settled: Optional[Callable[[date], Awaitable[None]]] = None
+
+    def start(self, on_settled: Optional[Callable[[date], Awaitable[None]]] = None):
+        self._on_settled = on_settled
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"settlement-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        # an interrupted batch rolls back, the job resumes once it goes stale
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """A job was queued (and committed)"""
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    claimed = await db.run_sync(
+                        SettlementJobCRUD.claim, self.stale_seconds
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Error claiming settlement job: {str(e)}")
+                claimed = None
+
+            if claimed is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, attempt = claimed
+            try:
+                await self._settle(job_id, attempt)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error settling job {job_id}: {str(e)}")
+                await self._finish(job_id, attempt, "FAILED", str(e))
+
+    async def _settle(self, job_id: int, attempt: int):
+        async with AsyncSessionLocal() as db:
+            job = await db.get(SettlementJob, job_id)
+            game = await db.get(Game, job.game_id)
+            # set together with the away score once the game has ended
+            scored = job.home_score is not None
+        logger.info(f"RUNNING SETTLEMENT JOB {job_id} FOR GAME {game.game_id}")
+
+        if not scored:
+            boxscore_data = await GameCRUD.get_boxscore_score(game.game_id)
+            if not boxscore_data:
+                await self._finish(
+                    job_id, attempt, "FAILED", "Failed to fetch boxscore data"
+                )
+                return
+            if boxscore_data.gameStatus != 3:
+                await self._finish(job_id, attempt, "NOT_ENDED")
+                return
+            async with AsyncSessionLocal() as db:
+                owned = await db.run_sync(
+                    SettlementJobCRUD.set_scores,
+                    job_id,
+                    attempt,
+                    boxscore_data.homeTeam.score,
+                    boxscore_data.awayTeam.score,
+                )
+                await db.commit()
+            if not owned:
+                return
+
+        more = True
+        while more:
+            async with AsyncSessionLocal() as db:
+                more = await db.run_sync(
+                    SettlementJobCRUD.settle_batch, job_id, attempt, self.batch_size
+                )
+                await db.commit()
+
+        async with AsyncSessionLocal() as db:
+            job = await db.get(SettlementJob, job_id)
+        logger.info(f"FINISHED SETTLEMENT JOB {job}")
+        if job.status == "SUCCEEDED" and job.attempts == attempt and self._on_settled:
+            await self._on_settled(game.game_date)
+
+    async def _finish(
+        self, job_id: int, attempt: int, status: str, error: Optional[str] = None
+    ):
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.run_sync(
+                    SettlementJobCRUD.finish, job_id, attempt, status, error
+                )
+                await db.commit()
+        except Exception as e:
+            # left RUNNING, it's retried once it goes stale
+            logger.error(f"Error finishing settlement job {job_id}: {str(e)}")
+
+
+settlement_queue = SettlementQueue()
@@ -1,48 +1,83 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, cast, func, tuple_, Float
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional, Tuple
 from app.models.bet import Bet
 from app.models.game import Game
 from app.models.user import User
 from app.schemas.bet import PlaceBetRequest, Team, UserBetWithGameInfo
+from app.core.serialization import RowSerializer
 from fastapi import HTTPException
 import logging
 
 logger = logging.getLogger(__name__)
 
+user_bet_serializer = RowSerializer(
+    UserBetWithGameInfo,
+    [
+        Bet.id,
+        Bet.user_id,
+        # API game id, not db game id
+        Game.game_id,
+        Bet.bet_type,
+        # odds went out through a float and a betting line of 0 as null, keep it that way
+        cast(Bet.odds, Float).label("odds"),
+        Bet.amount_placed,
+        Bet.total_payout,
+        Bet.placed_at,
+        Bet.status,
+        func.nullif(Bet.betting_line, 0, type_=Bet.betting_line.type).label(
+            "betting_line"
+        ),
+        Game.home_team,
+        Game.away_team,
+        Game.game_date,
+    ],
+)
+
 
 class BetCRUD:
     @staticmethod
-    def get_user_bets(db: Session, user_id: int) -> list[UserBetWithGameInfo]:
-        bets = (
-            db.query(Bet)
-            .filter(Bet.user_id == user_id)
-            .order_by(Bet.placed_at.desc())
-            .all()
+    def get_filters(
+        status: Optional[str] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        before: Optional[Tuple[datetime, int]] = None,
+    ) -> list:
+        """Criteria for a range of a user's bets in newest first (placed_at, id)
+        order. Dates are UTC days the bets were placed on, `before` is the
+        (placed_at, id) of the last bet already seen."""
+        criteria = []
+        if status is not None:
+            criteria.append(Bet.status == status)
+        if start_date is not None:
+            criteria.append(
+                Bet.placed_at >= datetime.combine(start_date, time.min, timezone.utc)
+            )
+        if end_date is not None:
+            criteria.append(
+                Bet.placed_at
+                < datetime.combine(end_date + timedelta(days=1), time.min, timezone.utc)
+            )
+        if before is not None:
+            criteria.append(tuple_(Bet.placed_at, Bet.id) < tuple_(*before))
+        return criteria
+
+    @staticmethod
+    def get_user_bets(
+        db: Session, user_id: int, limit: Optional[int] = None, **filters
+    ) -> list[UserBetWithGameInfo]:
+        """The user's bets with their games in one query, newest first,
+        optionally a page of them from a keyset range (see get_filters)"""
+        stmt = (
+            user_bet_serializer.select()
+            .join(Game, Game.id == Bet.game_id)
+            .where(Bet.user_id == user_id, *BetCRUD.get_filters(**filters))
+            .order_by(Bet.placed_at.desc(), Bet.id.desc())
+            .limit(limit)
         )
-        result = []
-        for bet in bets:
-            game = db.query(Game).filter(Game.id == bet.game_id).first()
-            if game:
-                bet_with_game_info = {
-                    "id": bet.id,
-                    "user_id": bet.user_id,
-                    "game_id": game.game_id,
-                    "bet_type": bet.bet_type,
-                    "odds": float(bet.odds),
-                    "amount_placed": bet.amount_placed,
-                    "total_payout": bet.total_payout,
-                    "placed_at": bet.placed_at,
-                    "status": bet.status,
-                    "betting_line": bet.betting_line if bet.betting_line else None,
-                    "home_team": game.home_team,
-                    "away_team": game.away_team,
-                    "game_date": game.game_date,
-                }
-                result.append(UserBetWithGameInfo.model_validate(bet_with_game_info))
-
-        return result
+        return user_bet_serializer.validate(db.execute(stmt))
 
     @staticmethod
     def create_bet(db: Session, user_id: int, request: PlaceBetRequest) -> Bet:
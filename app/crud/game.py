@@ -1,28 +1,121 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict
+from sqlalchemy import (
+    and_,
+    desc,
+    or_,
+    tuple_,
+    update,
+    values,
+    column,
+    cast,
+    func,
+    String,
+    Date,
+    Numeric,
+    Row,
+    select,
+)
+from datetime import date, datetime, time, timedelta
+from typing import Any, List, Optional, Dict, Iterable, Iterator, Tuple
 from app.models.game import Game
 from app.models.bet import Bet
-from app.crud.bet import BetCRUD
 from app.schemas.game import CurrentGameBettingInfos, GameResponse
+from app.schemas.odds import OddsIngestItem
+from app.schemas.bet import BoxscoreScore
+from app.core.serialization import RowSerializer
+from app.core.boxscore import boxscore_client
 import logging
-import aiohttp
 import pytz
 from collections import defaultdict
 
 logger = logging.getLogger(__name__)
 
+EASTERN = pytz.timezone("US/Eastern")
+# today's games stay "today" until this hour (Eastern) the next morning
+SLATE_ROLLOVER_HOURS = 2
+
+# GameResponse straight from the games table
+game_serializer = RowSerializer.for_table(GameResponse, Game)
+
+# Game columns the odds scraper updates
+ODDS_FIELDS = (
+    "home_spread",
+    "home_spread_odds",
+    "away_spread_odds",
+    "home_moneyline",
+    "away_moneyline",
+    "over_under",
+    "over_odds",
+    "under_odds",
+)
+
 
 class GameCRUD:
     @staticmethod
-    def get_all(db: Session) -> List[Game]:
-        res = db.query(Game).all()
-        return res
+    def get_filters(
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        has_ended: Optional[bool] = None,
+        after: Optional[Tuple[date, int]] = None,
+    ) -> list:
+        """Criteria for a range of games in (game_date, id) order. `after` is
+        the (game_date, id) of the last game already seen."""
+        criteria = []
+        if start_date is not None:
+            criteria.append(Game.game_date >= start_date)
+        if end_date is not None:
+            criteria.append(Game.game_date <= end_date)
+        if has_ended is not None:
+            criteria.append(Game.has_ended == has_ended)
+        if after is not None:
+            criteria.append(tuple_(Game.game_date, Game.id) > tuple_(*after))
+        return criteria
 
     @staticmethod
-    def get_by_date(db: Session, date: datetime) -> List[Game]:
-        return db.query(Game).filter(Game.game_date == date).all()
+    def get_responses(
+        db: Session, *criteria, limit: Optional[int] = None
+    ) -> List[GameResponse]:
+        """Matching games as response models, in (game_date, id) order,
+        without loading ORM objects"""
+        stmt = (
+            game_serializer.select()
+            .where(*criteria)
+            .order_by(Game.game_date, Game.id)
+            .limit(limit)
+        )
+        return game_serializer.validate(db.execute(stmt))
+
+    @staticmethod
+    def get_page(db: Session, limit: int, **filters) -> List[GameResponse]:
+        """Up to `limit` games from a keyset range (see get_filters)"""
+        return GameCRUD.get_responses(db, *GameCRUD.get_filters(**filters), limit=limit)
+
+    @staticmethod
+    def iter_games(
+        db: Session, batch_size: int = 1000, limit: Optional[int] = None, **filters
+    ) -> Iterator[List[GameResponse]]:
+        """Stream games from a keyset range, `batch_size` at a time, without
+        loading them all at once"""
+        stmt = (
+            game_serializer.select()
+            .where(*GameCRUD.get_filters(**filters))
+            .order_by(Game.game_date, Game.id)
+            .limit(limit)
+            .execution_options(yield_per=batch_size)
+        )
+        for rows in db.execute(stmt).partitions():
+            yield game_serializer.validate(rows)
+
+    @staticmethod
+    def get_version(db: Session, *criteria) -> str:
+        """A cheap fingerprint of the games matching `criteria` that changes
+        whenever one of them is added, removed or updated"""
+        count, max_id, last_updated = (
+            db.query(func.count(Game.id), func.max(Game.id), func.max(Game.updated_at))
+            .filter(*criteria)
+            .one()
+        )
+        return f"{count}:{max_id}:{last_updated.isoformat() if last_updated else ''}"
 
     @staticmethod
     def get_by_game_id(db: Session, game_id: str) -> Optional[Game]:
@@ -45,6 +138,106 @@ class GameCRUD:
             .first()
         )
 
+    @staticmethod
+    def get_many(
+        db: Session,
+        game_ids: Iterable[str] = (),
+        teams_and_dates: Iterable[Tuple[str, str, datetime]] = (),
+    ) -> List[GameResponse]:
+        """Fetch games by game_id and/or (home_team, away_team, game_date) in one query"""
+        game_ids = list(game_ids)
+        teams_and_dates = list(teams_and_dates)
+        conditions = []
+        if game_ids:
+            conditions.append(Game.game_id.in_(game_ids))
+        if teams_and_dates:
+            conditions.append(
+                tuple_(Game.home_team, Game.away_team, Game.game_date).in_(
+                    teams_and_dates
+                )
+            )
+        if not conditions:
+            return []
+        return GameCRUD.get_responses(db, or_(*conditions))
+
+    @staticmethod
+    def bulk_update_odds(
+        db: Session, items: List[OddsIngestItem]
+    ) -> List[Tuple[Row, Dict[str, Any]]]:
+        """Write new odds for many games in a single UPDATE ... FROM (VALUES ...)
+        RETURNING statement. Returns each updated games row with its odds from
+        before the update.
+
+        Games are matched by game_id, or by teams and date when game_id is not
+        given. Odds that are None are left unchanged.
+        """
+        # one row per game, the last item for a game wins
+        rows = {}
+        for item in items:
+            key = item.game_id or (item.home_team, item.away_team, item.game_date)
+            rows[key] = (
+                item.game_id,
+                item.home_team,
+                item.away_team,
+                item.game_date,
+                *(getattr(item, field) for field in ODDS_FIELDS),
+            )
+        if not rows:
+            return []
+
+        new_odds = values(
+            column("game_id", String),
+            column("home_team", String),
+            column("away_team", String),
+            column("game_date", Date),
+            *(column(field, Numeric) for field in ODDS_FIELDS),
+            name="new_odds",
+        ).data(list(rows.values()))
+
+        games = Game.__table__
+        # joining the table to itself gives the row as it was before this
+        # statement, for odds history
+        previous = games.alias("previous")
+
+        # VALUES columns that are NULL in every row have no type, so cast
+        matches_game_id = and_(
+            new_odds.c.game_id.isnot(None),
+            games.c.game_id == cast(new_odds.c.game_id, String),
+        )
+        matches_teams = and_(
+            new_odds.c.game_id.is_(None),
+            games.c.home_team == cast(new_odds.c.home_team, String),
+            games.c.away_team == cast(new_odds.c.away_team, String),
+            games.c.game_date == cast(new_odds.c.game_date, Date),
+        )
+        stmt = (
+            update(games)
+            .where(previous.c.id == games.c.id)
+            .where(or_(matches_game_id, matches_teams))
+            .values(
+                {
+                    **{
+                        field: func.coalesce(
+                            cast(new_odds.c[field], Numeric), games.c[field]
+                        )
+                        for field in ODDS_FIELDS
+                    },
+                    "updated_at": func.now(),
+                }
+            )
+            .returning(
+                *games.c,
+                *(
+                    previous.c[field].label(f"previous_{field}")
+                    for field in ODDS_FIELDS
+                ),
+            )
+        )
+        return [
+            (row, {field: getattr(row, f"previous_{field}") for field in ODDS_FIELDS})
+            for row in db.execute(stmt).all()
+        ]
+
     @staticmethod
     def update_game_id(
         db: Session, home_team: str, away_team: str, game_date: datetime, game_id: str
@@ -56,59 +249,30 @@ class GameCRUD:
 
     @staticmethod
     def mark_game_ended(db: Session, game_id: str) -> bool:
-        game = GameCRUD.get_by_game_id(game_id)
+        game = GameCRUD.get_by_game_id(db, game_id)
         if game:
             game.has_ended = True
             return True
         return False
 
     @staticmethod
-    async def get_boxscore(game_id: str):
-        """Fetch boxscore data from NBA API"""
-        host = "https://cdn.nba.com"
-        url = f"{host}/static/json/liveData/boxscore/boxscore_{game_id}.json"
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    logger.error(
-                        f"Failed to fetch boxscore for game_id {game_id}: Status {response.status}"
-                    )
-                    return None
-                data = await response.json()
-                return data["game"]
+    async def get_boxscore_score(game_id: str) -> Optional[BoxscoreScore]:
+        """Fetch just the game status and team scores from NBA API"""
+        return await boxscore_client.get_score(game_id)
 
     @staticmethod
-    async def process_game(db: Session, game_id: str) -> Optional[Game]:
-        game = db.query(Game).filter(Game.game_id == game_id).first()
-        logger.info(f"\nPROCESSING GAME {game}")
-        if game:
-            boxscore_data = await GameCRUD.get_boxscore(game.game_id)
-            if not boxscore_data:
-                logger.error(
-                    f"Could not process game {game_id}: Failed to fetch boxscore data"
-                )
-                raise Exception("Game has not ended")
-
-            home_team_stats = boxscore_data["homeTeam"]
-            away_team_stats = boxscore_data["awayTeam"]
-            logger.info(
-                f"GAME STATUS IS {boxscore_data['gameStatus']} (IT SHOULD BE 3)"
-            )
-            if boxscore_data["gameStatus"] != 3:
-                logger.error(
-                    f"GAMAE STATUS IS NOT 3 SO IT HASNT ENDED, MUST BE PROB WITH SCRAPER. RETURNING"
-                )
-                return None
-            bets = (
-                db.query(Bet)
-                .filter(and_(Bet.game_id == game.id, Bet.status == "PENDING"))
-                .all()
-            )
-            logger.info(f"FOUND BETS: {len(bets)}")
-            for bet in bets:
-                BetCRUD.process_bet(db, bet, home_team_stats, away_team_stats)
-        return game
+    def get_unsettled_games(db: Session, game_date: date) -> List[Row]:
+        """(id, game_id) of the date's games that still have pending bets"""
+        pending = (
+            select(Bet.id)
+            .where(Bet.game_id == Game.id, Bet.status == "PENDING")
+            .exists()
+        )
+        return db.execute(
+            select(Game.id, Game.game_id)
+            .where(Game.game_date == game_date, Game.game_id.isnot(None), pending)
+            .order_by(Game.id)
+        ).all()
 
     @staticmethod
     def get_ordinal(n):
@@ -131,19 +295,26 @@ class GameCRUD:
         return display_str
 
     @staticmethod
-    def get_todays_odds(db: Session) -> CurrentGameBettingInfos:
-        logger.info("IN TODAY ENDPOINT")
-
-        eastern = pytz.timezone("US/Eastern")
-        today_est = datetime.now(eastern)
+    def get_slate_date(now: Optional[datetime] = None) -> date:
+        """The date whose games are "today's" games"""
+        now = now or datetime.now(EASTERN)
         # Subtract 2 hours (if its 1:45 AM April 20, it becomes 11:45 PM April 19)
         # This is for considering "yesterdays" games that are ongoing when it's like 12:30 AM, as today's games
-        adjusted_time = today_est - timedelta(hours=2)
-        tomorrow_time = adjusted_time + timedelta(days=1)
+        return (now - timedelta(hours=SLATE_ROLLOVER_HOURS)).date()
+
+    @staticmethod
+    def get_slate_rollover(slate_date: date) -> datetime:
+        """When the slate starting on slate_date stops being today's"""
+        return EASTERN.localize(
+            datetime.combine(slate_date + timedelta(days=1), time(SLATE_ROLLOVER_HOURS))
+        )
 
-        # Get the date from the adjusted time
-        adjusted_date = adjusted_time.date()
-        tomorrow_date = tomorrow_time.date()
+    @staticmethod
+    def get_todays_odds(db: Session) -> CurrentGameBettingInfos:
+        logger.info("IN TODAY ENDPOINT")
+
+        adjusted_date = GameCRUD.get_slate_date()
+        tomorrow_date = adjusted_date + timedelta(days=1)
 
         tomorrow_str = tomorrow_date.strftime("%Y-%m-%d")
 
@@ -165,17 +336,11 @@ class GameCRUD:
             return CurrentGameBettingInfos(root={"no_games": []})
 
         # Query all games from today (adjusted_date) to most recent date that have not ended
-        games_in_range = (
-            db.query(Game)
-            .filter(
-                and_(
-                    Game.game_date >= adjusted_date,
-                    Game.game_date <= most_recent_date,
-                    Game.has_ended == False,
-                )
-            )
-            .order_by(Game.game_date)
-            .all()
+        games_in_range = GameCRUD.get_responses(
+            db,
+            Game.game_date >= adjusted_date,
+            Game.game_date <= most_recent_date,
+            Game.has_ended == False,
         )
 
         if not games_in_range:
@@ -188,11 +353,11 @@ class GameCRUD:
         response_dict: Dict[str, List[GameResponse]] = defaultdict(list)
 
         for game in games_in_range:
-            date_str = game.game_date.date().strftime("%Y-%m-%d")
+            date_str = game.game_date.strftime("%Y-%m-%d")
             display_str = GameCRUD.get_date_display_str(
                 date_str, today_str, tomorrow_str
             )
-            response_dict[display_str].append(GameResponse.model_validate(game))
+            response_dict[display_str].append(game)
 
         # Ensure we have at least one date key
         if not response_dict:
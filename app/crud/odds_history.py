@@ -0,0 +1,152 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, func, literal_column, true
+from sqlalchemy.dialects.postgresql import array_agg, aggregate_order_by
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.models.game import Game
+from app.models.odds_history import OddsHistory
+from app.crud.game import ODDS_FIELDS
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _latest(column):
+    """Most recent non-NULL value of a history column within a group, eg. a
+    line-movement bucket"""
+    return array_agg(aggregate_order_by(column, OddsHistory.recorded_at.desc())).filter(
+        column.isnot(None)
+    )[1]
+
+
+def _current(column):
+    """Most recent non-NULL value of a history column for the outer query's
+    game. Walks ix_odds_history_game_id_recorded_at backwards from the newest
+    row, so it only reads the game's last few rows, not its whole history"""
+    return (
+        select(column)
+        .where(OddsHistory.game_id == Game.id, column.isnot(None))
+        .order_by(OddsHistory.recorded_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+class OddsHistoryCRUD:
+    @staticmethod
+    def get_latest_odds(
+        db: Session, game_ids: Iterable[int]
+    ) -> Dict[int, Dict[str, Any]]:
+        """Last recorded value of every odds column, per game PK (None where
+        nothing was recorded)"""
+        game_ids = list(game_ids)
+        if not game_ids:
+            return {}
+        rows = db.execute(
+            select(
+                Game.id,
+                *(
+                    _current(getattr(OddsHistory, field)).label(field)
+                    for field in ODDS_FIELDS
+                ),
+            ).where(Game.id.in_(game_ids))
+        ).all()
+        return {
+            row.id: {field: getattr(row, field) for field in ODDS_FIELDS}
+            for row in rows
+        }
+
+    @staticmethod
+    def record_changes(
+        db: Session,
+        changes: Iterable[Tuple[int, Optional[Dict[str, Any]], Dict[str, Any]]],
+    ) -> int:
+        """Append one row per game whose odds changed. `changes` holds
+        (game PK, previous odds or None if unknown, new odds). Returns the
+        number of rows written."""
+        rows = []
+        for game_id, previous, current in changes:
+            previous = previous or {}
+            changed = {
+                field: current[field]
+                for field in ODDS_FIELDS
+                if current.get(field) is not None
+                and current[field] != previous.get(field)
+            }
+            if changed:
+                rows.append(
+                    {
+                        "game_id": game_id,
+                        **{field: changed.get(field) for field in ODDS_FIELDS},
+                    }
+                )
+        if rows:
+            db.execute(insert(OddsHistory), rows)
+        return len(rows)
+
+    @staticmethod
+    def record_games(db: Session, games: List[Game]) -> int:
+        """Record the current odds of games whose previous values are only
+        known from the history itself (eg. odds written by the scraper)"""
+        previous = OddsHistoryCRUD.get_latest_odds(db, (game.id for game in games))
+        return OddsHistoryCRUD.record_changes(
+            db,
+            (
+                (
+                    game.id,
+                    previous.get(game.id),
+                    {field: getattr(game, field) for field in ODDS_FIELDS},
+                )
+                for game in games
+            ),
+        )
+
+    @staticmethod
+    def get_line_movement(
+        db: Session, game_pk: int, points: int, fields: Iterable[str] = ODDS_FIELDS
+    ) -> List[Dict[str, Any]]:
+        """The game's odds history downsampled in the database to at most
+        `points` evenly spaced time buckets. Each point holds the last value
+        of each field at the end of its bucket."""
+        fields = list(fields)
+        bounds = (
+            select(
+                func.min(OddsHistory.recorded_at).label("first_at"),
+                func.max(OddsHistory.recorded_at).label("last_at"),
+            )
+            .where(OddsHistory.game_id == game_pk)
+            .subquery()
+        )
+        span = func.extract("epoch", bounds.c.last_at - bounds.c.first_at)
+        offset = func.extract("epoch", OddsHistory.recorded_at - bounds.c.first_at)
+        bucket = func.least(
+            points - 1,
+            func.floor(offset / func.greatest(span / points, 0.000001)),
+        ).label("bucket")
+
+        rows = db.execute(
+            select(
+                bucket,
+                func.max(OddsHistory.recorded_at).label("recorded_at"),
+                *(
+                    _latest(getattr(OddsHistory, field)).label(field)
+                    for field in fields
+                ),
+            )
+            .select_from(OddsHistory)
+            .join(bounds, true())
+            .where(OddsHistory.game_id == game_pk)
+            .group_by(literal_column("bucket"))
+            .order_by(literal_column("bucket"))
+        ).all()
+
+        # rows only hold values that changed in their bucket, carry the rest
+        # forward so every point is a full picture
+        series = []
+        current = {field: None for field in fields}
+        for row in rows:
+            for field in fields:
+                value = getattr(row, field)
+                if value is not None:
+                    current[field] = value
+            series.append({"recorded_at": row.recorded_at, **current})
+        return series
@@ -0,0 +1,263 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import Row, column, func, or_, select, update, values
+from sqlalchemy import BigInteger, Numeric
+from sqlalchemy.dialects.postgresql import insert
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+from app.models.bet import Bet
+from app.models.game import Game
+from app.models.settlement_job import SettlementJob
+from app.models.user import User
+from app.crud.game import GameCRUD
+from app.core import grading
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# a failed or too-early job is queued again when settlement is asked for again
+RETRYABLE_STATUSES = ("NOT_ENDED", "FAILED")
+
+
+class SettlementJobCRUD:
+    @staticmethod
+    def enqueue(db: Session, game_pk: int) -> SettlementJob:
+        """The game's settlement job, queued if it's new or can be retried"""
+        db.execute(
+            insert(SettlementJob)
+            .values(game_id=game_pk, status="QUEUED")
+            .on_conflict_do_nothing(index_elements=[SettlementJob.game_id])
+        )
+        job = db.scalar(
+            select(SettlementJob)
+            .where(SettlementJob.game_id == game_pk)
+            .with_for_update()
+        )
+        if job.status in RETRYABLE_STATUSES:
+            job.status = "QUEUED"
+            job.error = None
+            job.finished_at = None
+            # only pending bets are graded, so starting over never regrades
+            # one, and picks up bets skipped last time (eg. a line since set)
+            job.last_bet_id = 0
+        return job
+
+    @staticmethod
+    def enqueue_date(db: Session, game_date: date) -> List[Tuple[str, SettlementJob]]:
+        """(game_id, job) for every game on the date that still has pending
+        bets, each queued as in enqueue"""
+        return [
+            (game.game_id, SettlementJobCRUD.enqueue(db, game.id))
+            for game in GameCRUD.get_unsettled_games(db, game_date)
+        ]
+
+    @staticmethod
+    def _status_query():
+        return select(
+            SettlementJob.id,
+            Game.game_id,
+            SettlementJob.status,
+            SettlementJob.attempts,
+            SettlementJob.bets,
+            SettlementJob.won,
+            SettlementJob.push,
+            SettlementJob.lost,
+            SettlementJob.paid_out,
+            SettlementJob.error,
+            SettlementJob.created_at,
+            SettlementJob.updated_at,
+            SettlementJob.finished_at,
+        ).join(Game, Game.id == SettlementJob.game_id)
+
+    @staticmethod
+    def get_status(db: Session, job_id: int) -> Optional[Row]:
+        """The job's columns with the game's API game_id"""
+        return db.execute(
+            SettlementJobCRUD._status_query().where(SettlementJob.id == job_id)
+        ).one_or_none()
+
+    @staticmethod
+    def get_date_status(db: Session, game_date: date) -> List[Row]:
+        """get_status for every job of a game on the date"""
+        return db.execute(
+            SettlementJobCRUD._status_query()
+            .where(Game.game_date == game_date)
+            .order_by(Game.id)
+        ).all()
+
+    @staticmethod
+    def claim(db: Session, stale_after: float) -> Optional[Tuple[int, int]]:
+        """Take the oldest queued job, or a running one whose worker stopped
+        checking in (eg. its process died). Returns (job id, attempt)."""
+        stale = func.now() - timedelta(seconds=stale_after)
+        next_job = (
+            select(SettlementJob.id)
+            .where(
+                or_(
+                    SettlementJob.status == "QUEUED",
+                    (SettlementJob.status == "RUNNING")
+                    & (SettlementJob.heartbeat_at < stale),
+                )
+            )
+            .order_by(SettlementJob.id)
+            .limit(1)
+            # other workers skip a job being claimed instead of waiting on it
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        claimed = db.execute(
+            update(SettlementJob)
+            .where(SettlementJob.id == next_job)
+            .values(
+                status="RUNNING",
+                attempts=SettlementJob.attempts + 1,
+                heartbeat_at=func.now(),
+            )
+            .returning(SettlementJob.id, SettlementJob.attempts)
+            .execution_options(synchronize_session=False)
+        ).one_or_none()
+        return tuple(claimed) if claimed else None
+
+    @staticmethod
+    def _lock(db: Session, job_id: int, attempt: int) -> Optional[SettlementJob]:
+        """The job, if this attempt still owns it"""
+        job = db.scalar(
+            select(SettlementJob).where(SettlementJob.id == job_id).with_for_update()
+        )
+        if job is None or job.status != "RUNNING" or job.attempts != attempt:
+            logger.warning(f"SETTLEMENT JOB {job_id} ATTEMPT {attempt} WAS TAKEN OVER")
+            return None
+        return job
+
+    @staticmethod
+    def set_scores(
+        db: Session, job_id: int, attempt: int, home_score: int, away_score: int
+    ) -> bool:
+        job = SettlementJobCRUD._lock(db, job_id, attempt)
+        if job is None:
+            return False
+        job.home_score = home_score
+        job.away_score = away_score
+        job.heartbeat_at = func.now()
+        return True
+
+    @staticmethod
+    def finish(
+        db: Session, job_id: int, attempt: int, status: str, error: str = None
+    ) -> bool:
+        job = SettlementJobCRUD._lock(db, job_id, attempt)
+        if job is None:
+            return False
+        job.status = status
+        job.error = error
+        job.finished_at = func.now()
+        return True
+
+    @staticmethod
+    def settle_batch(db: Session, job_id: int, attempt: int, batch_size: int) -> bool:
+        """Grade the next batch of the game's pending bets past the job's
+        checkpoint, credit their users and move the checkpoint, all in the
+        caller's transaction. False once there's nothing left to do."""
+        job = SettlementJobCRUD._lock(db, job_id, attempt)
+        if job is None:
+            return False
+
+        rows = db.execute(
+            select(Bet.id, *grading.BET_COLUMNS)
+            .where(
+                Bet.game_id == job.game_id,
+                Bet.status == "PENDING",
+                Bet.id > job.last_bet_id,
+            )
+            .order_by(Bet.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            # whatever is still pending was skipped as ungradable
+            ungraded = db.scalar(
+                select(func.count()).where(
+                    Bet.game_id == job.game_id, Bet.status == "PENDING"
+                )
+            )
+            if ungraded:
+                job.status = "FAILED"
+                job.error = (
+                    f"{ungraded} pending bets could not be graded, "
+                    "eg. a spread or total without a line"
+                )
+            else:
+                job.status = "SUCCEEDED"
+            job.finished_at = func.now()
+            return False
+
+        bet_ids = np.array([row[0] for row in rows], np.int64)
+        bets = grading.BetColumns.from_rows(row[1:] for row in rows)
+        outcome = grading.grade(bets, job.home_score, job.away_score)
+
+        # users first, in id order, so settlements sharing users queue up
+        # instead of deadlocking
+        db.execute(
+            select(User.id)
+            .where(User.id.in_(np.unique(bets.user_id).tolist()))
+            .order_by(User.id)
+            .with_for_update()
+        )
+        graded = np.zeros(len(rows), bool)
+        for code in (grading.WON, grading.PUSH, grading.LOST):
+            ids = bet_ids[outcome == code].tolist()
+            if ids:
+                # still pending: another settlement may have got to some first
+                updated = db.scalars(
+                    update(Bet)
+                    .where(Bet.id.in_(ids), Bet.status == "PENDING")
+                    .values(status=grading.STATUSES[code])
+                    .returning(Bet.id)
+                    .execution_options(synchronize_session=False)
+                ).all()
+                graded |= np.isin(bet_ids, updated)
+        outcome[~graded] = grading.PENDING
+
+        credits = grading.credit_totals(bets, outcome)
+        if len(credits.user_id):
+            owed = values(
+                column("user_id", BigInteger),
+                column("amount_won", Numeric(14, 2)),
+                column("bets_won", BigInteger),
+                column("credit", Numeric(14, 2)),
+                name="owed",
+            ).data(
+                [
+                    (
+                        int(user_id),
+                        grading.from_hundredths(amount_won),
+                        int(bets_won),
+                        grading.from_hundredths(credit),
+                    )
+                    for user_id, amount_won, bets_won, credit in zip(
+                        credits.user_id,
+                        credits.amount_won,
+                        credits.bets_won,
+                        credits.credit,
+                    )
+                ]
+            )
+            db.execute(
+                update(User)
+                .where(User.id == owed.c.user_id)
+                .values(
+                    amount_won=User.amount_won + owed.c.amount_won,
+                    bets_won=User.bets_won + owed.c.bets_won,
+                    balance=User.balance + owed.c.credit,
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        won = outcome == grading.WON
+        job.last_bet_id = int(bet_ids[-1])
+        job.bets += int(graded.sum())
+        job.won += int(won.sum())
+        job.push += int((outcome == grading.PUSH).sum())
+        job.lost += int((outcome == grading.LOST).sum())
+        job.paid_out += grading.from_hundredths(bets.total_payout[won].sum())
+        job.heartbeat_at = func.now()
+        return True
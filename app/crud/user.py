@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from app.models.user import User
-from app.core.security import get_password_hash, verify_password
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.security import password_hasher
 from sqlalchemy import func
 from typing import Optional
 from sqlalchemy.exc import IntegrityError
@@ -35,41 +36,46 @@ class UserCRUD:
             return False
 
     @staticmethod
-    def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    async def authenticate_user(
+        db: AsyncSession, username: str, password: str
+    ) -> Optional[User]:
         print(f"in authenticate user")
-        user = UserCRUD.get_user_by_username(db, username)
+        user = await db.run_sync(UserCRUD.get_user_by_username, username)
         if not user:
             print("couldnt find user")
             return None
-        if not verify_password(password, user.password):
+        if not await password_hasher.verify(password, user.password):
             print("wrong pw")
             return None
         return user
 
     @staticmethod
-    def create_user(db: Session, username: str, password: str) -> tuple[User, str]:
+    async def create_user(
+        db: AsyncSession, username: str, password: str
+    ) -> tuple[User, str]:
         try:
             # Check if user exists
-            existing_user = UserCRUD.get_user_by_username(db, username)
+            existing_user = await db.run_sync(UserCRUD.get_user_by_username, username)
             if existing_user:
                 raise HTTPException(
                     status_code=400, detail="Username already registered"
                 )
 
             # Create new user
-            hashed_password = get_password_hash(password)
+            hashed_password = await password_hasher.hash(password)
             db_user = User(username=username, password=hashed_password)
             db.add(db_user)
-            db.commit()
+            await db.commit()
 
             # Generate token
             access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
             access_token = create_access_token(
-                data={"sub": db_user.username}, expires_delta=access_token_expires
+                data={"sub": db_user.username, "uid": db_user.id},
+                expires_delta=access_token_expires,
             )
 
             return db_user, access_token
 
         except IntegrityError:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(status_code=400, detail="Username already registered")
@@ -0,0 +1,56 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# async drivers for the sync URLs we're given in DATABASE_URL. Postgres only:
+# the CRUD classes use Postgres SQL (UPDATE ... FROM VALUES, ON CONFLICT,
+# array_agg, SKIP LOCKED), so a test stand-in has to be a local Postgres too
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def to_async_url(database_url: str):
+    url = make_url(database_url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+    # asyncpg calls libpq's sslmode "ssl"
+    if url.drivername == "postgresql+asyncpg" and "sslmode" in url.query:
+        url = url.difference_update_query(["sslmode"]).update_query_dict(
+            {"ssl": url.query["sslmode"]}
+        )
+    return url
+
+
+ASYNC_DATABASE_URL = to_async_url(os.getenv("DATABASE_URL"))
+
+# Create engine, same pool sizes as the sync one
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, pool_pre_ping=True, pool_size=5, max_overflow=10
+)
+
+# objects stay readable after the commit in get_async_db, eg. the current user
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+async def get_async_db():
+    db = AsyncSessionLocal()
+    try:
+        yield db
+        await db.commit()
+    except:
+        # If there's an error
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
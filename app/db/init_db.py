@@ -0,0 +1,90 @@
+"""Create the tables and indexes added after the original schema.
+
+Run once per deploy, before the web processes start (the Procfile's release
+phase), not on every worker's startup:
+
+    python -m app.db.init_db
+
+Safe to run again or from two places at once: it holds an advisory lock,
+skips whatever already exists and, on Postgres, builds indexes CONCURRENTLY
+so the bets and users tables keep taking writes meanwhile.
+"""
+
+from sqlalchemy import Index, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+from app.db.base import Base
+from app.db.session import engine
+from app.models.game import Game
+from app.models.odds_history import OddsHistory
+from app.models.settlement_job import SettlementJob
+from app.models.user import User
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# tables added to the original schema
+ADDED_TABLES = (OddsHistory.__table__, SettlementJob.__table__)
+
+# indexes added to tables that already existed
+ADDED_INDEXES = (
+    "ix_users_username_lower",
+    "ix_bets_game_id_status",
+    "ix_bets_user_id_placed_at",
+)
+
+# any constant shared by everything that runs this script
+INIT_DB_LOCK = 4_201_905
+# seconds between tries for the lock
+INIT_DB_LOCK_POLL = 1
+
+
+def create_index(conn: Connection, index: Index):
+    """CREATE INDEX IF NOT EXISTS, which unlike checkfirst also sees
+    expression indexes on SQLite"""
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+    if conn.dialect.name == "postgresql":
+        # doesn't block writes while it builds. A build that fails leaves an
+        # INVALID index that IF NOT EXISTS skips: drop it and run this again
+        ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+    logger.info(f"CREATING INDEX {index.name}")
+    conn.execute(text(ddl))
+
+
+def acquire_lock(conn: Connection):
+    # polled rather than waited on: a session blocked in pg_advisory_lock
+    # counts as a running transaction, which CREATE INDEX CONCURRENTLY in the
+    # session holding the lock would wait for, deadlocking the two
+    while not conn.scalar(
+        text("SELECT pg_try_advisory_lock(:key)"), {"key": INIT_DB_LOCK}
+    ):
+        logger.info("WAITING FOR ANOTHER init_db TO FINISH")
+        time.sleep(INIT_DB_LOCK_POLL)
+
+
+def init_db():
+    """Create tables and indexes that were added after the original schema.
+    Existing ones are left alone."""
+    # CONCURRENTLY can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        postgres = conn.dialect.name == "postgresql"
+        if postgres:
+            # a second deploy waits here instead of racing the first one
+            acquire_lock(conn)
+        try:
+            Base.metadata.create_all(bind=conn, tables=list(ADDED_TABLES))
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    if index.name in ADDED_INDEXES:
+                        create_index(conn, index)
+        finally:
+            if postgres:
+                conn.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": INIT_DB_LOCK}
+                )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    init_db()
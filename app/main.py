@@ -1,10 +1,18 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from app.db.session import get_db
 from app.db.base import Base
 from app.db.session import engine
-from app.api.v1.endpoints import games, auth, bets, websocket, odds, user
+from app.db.async_session import async_engine
+from app.core.auth import require_internal_token
+from app.core.boxscore import boxscore_client
+from app.core.security import HasherBusy, password_hasher
+from app.core.settlement_queue import settlement_queue
+from app.api.v1.endpoints import games, auth, bets, websocket, odds, user, internal
+from app.api.v1.endpoints.websocket import odds_manager
+from contextlib import asynccontextmanager
 import logging
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -21,7 +29,36 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # schema changes are applied by `python -m app.db.init_db` on release,
+    # see the Procfile
+    # joins the cross-worker odds broadcast bus and loads today's slate
+    await odds_manager.start()
+    await boxscore_client.start()
+    settlement_queue.start(on_settled=odds_manager.publish_games_changed)
+    yield
+    # merged odds notifications still waiting on their window go out now,
+    # while the bus and the database are up
+    await odds.odds_coalescer.aclose()
+    await settlement_queue.stop()
+    await odds_manager.stop()
+    await boxscore_client.close()
+    await async_engine.dispose()
+    password_hasher.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(HasherBusy)
+async def hasher_busy_handler(request: Request, exc: HasherBusy):
+    # logins/registrations beyond what the bcrypt pool can take, try again shortly
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"}
+    )
+
 
 origins = [
     "http://localhost:3000",
@@ -47,6 +84,13 @@ app.include_router(bets.router, prefix="/api/bets", tags=["bets"])
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(user.router, prefix="/api/user", tags=["user"])
 app.include_router(odds.router, prefix="/api", tags=["odds"])
+# operators' stats, only with INTERNAL_API_TOKEN set
+app.include_router(
+    internal.router,
+    prefix="/api/internal",
+    tags=["internal"],
+    dependencies=[Depends(require_internal_token)],
+)
 
 
 app.include_router(websocket.router)
@@ -8,6 +8,7 @@ from sqlalchemy import (
     func,
     ForeignKey,
     Enum as SQLEnum,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -47,6 +48,13 @@ class Bet(Base):
     status = Column(String(20), default="PENDING", nullable=False)
     betting_line = Column(Numeric(10, 2))
 
+    __table_args__ = (
+        # settlement grades a game's pending bets
+        Index("ix_bets_game_id_status", game_id, status),
+        # a user's bet history, newest first
+        Index("ix_bets_user_id_placed_at", user_id, placed_at),
+    )
+
     def __repr__(self):
         return (
             f"<Bet("
@@ -0,0 +1,45 @@
+from sqlalchemy import (
+    Column,
+    BigInteger,
+    Numeric,
+    DateTime,
+    func,
+    ForeignKey,
+    Index,
+)
+from app.db.base import Base
+
+
+class OddsHistory(Base):
+    """Append-only log of odds changes. Each row only sets the columns that
+    changed; NULL means unchanged since the previous row for the game."""
+
+    __tablename__ = "odds_history"
+
+    id = Column(BigInteger, primary_key=True)
+    # the PK of game, not game's game_id column
+    game_id = Column(BigInteger, ForeignKey("games.id"), nullable=False)
+    recorded_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    home_spread = Column(Numeric(5, 2))
+    home_spread_odds = Column(Numeric(6, 2))
+    away_spread_odds = Column(Numeric(6, 2))
+    home_moneyline = Column(Numeric(8, 2))
+    away_moneyline = Column(Numeric(8, 2))
+    over_under = Column(Numeric(5, 2))
+    over_odds = Column(Numeric(6, 2))
+    under_odds = Column(Numeric(6, 2))
+
+    __table_args__ = (
+        Index("ix_odds_history_game_id_recorded_at", "game_id", "recorded_at"),
+    )
+
+    def __repr__(self):
+        return (
+            f"<OddsHistory("
+            f"game_id={self.game_id}, "
+            f"recorded_at={self.recorded_at}"
+            f")>"
+        )
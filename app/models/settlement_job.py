@@ -0,0 +1,63 @@
+from sqlalchemy import (
+    Column,
+    BigInteger,
+    String,
+    Numeric,
+    DateTime,
+    Text,
+    func,
+    ForeignKey,
+)
+from app.db.base import Base
+
+
+class SettlementJob(Base):
+    """A queued settlement of one game's bets. The game is the idempotency
+    key: asking to settle it again returns the same job."""
+
+    __tablename__ = "settlement_jobs"
+
+    id = Column(BigInteger, primary_key=True)
+    # the PK of game, not game's game_id column
+    game_id = Column(BigInteger, ForeignKey("games.id"), nullable=False, unique=True)
+
+    # QUEUED, RUNNING, SUCCEEDED, NOT_ENDED or FAILED
+    status = Column(String(20), default="QUEUED", nullable=False)
+    # bumped on every claim, a worker whose claim was taken over stops
+    attempts = Column(BigInteger, default=0, nullable=False)
+
+    # final score, kept so a resumed job grades against the same result
+    home_score = Column(BigInteger)
+    away_score = Column(BigInteger)
+    # checkpoint: bets up to this id have been graded
+    last_bet_id = Column(BigInteger, default=0, nullable=False)
+
+    bets = Column(BigInteger, default=0, nullable=False)
+    won = Column(BigInteger, default=0, nullable=False)
+    push = Column(BigInteger, default=0, nullable=False)
+    lost = Column(BigInteger, default=0, nullable=False)
+    paid_out = Column(Numeric(14, 2), default=0, nullable=False)
+    error = Column(Text)
+
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+    # last sign of life from the worker running it
+    heartbeat_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    def __repr__(self):
+        return (
+            f"<SettlementJob("
+            f"id={self.id}, "
+            f"game_id={self.game_id}, "
+            f"status={self.status}, "
+            f"last_bet_id={self.last_bet_id}"
+            f")>"
+        )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, String, DateTime, func, Numeric
+from sqlalchemy import Column, BigInteger, String, DateTime, func, Numeric, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base import Base
@@ -25,5 +25,10 @@ class User(Base):
 
     bets = relationship("Bet", back_populates="user", lazy="dynamic")
 
+    __table_args__ = (
+        # usernames are looked up case-insensitively
+        Index("ix_users_username_lower", func.lower(username)),
+    )
+
     def __repr__(self):
         return f"<User(username={self.username}, bets_placed={self.bets_placed})>"
@@ -222,3 +222,26 @@ class Team(BaseModel):
     periods: List[Period]
     players: List[Player]
     statistics: TeamStatistics
+
+
+class TeamScore(BaseModel):
+    """The part of a boxscore Team that settlement needs"""
+
+    teamId: int
+    teamName: str
+    teamCity: str
+    teamTricode: str
+    score: int
+
+
+class BoxscoreScore(BaseModel):
+    gameId: str
+    gameStatus: int
+    homeTeam: TeamScore
+    awayTeam: TeamScore
+
+
+class BoxscoreScoreDocument(BaseModel):
+    """A CDN boxscore document, keeping only the scores"""
+
+    game: BoxscoreScore
@@ -64,12 +64,8 @@ class ProcessResponse(BaseModel):
     success: bool
     message: str
     game_id: str
-
-
-class ProcessResponse(BaseModel):
-    success: bool
-    message: str
-    game_id: str
+    job_id: Optional[int] = None
+    job_status: Optional[str] = None
 
 
 class CurrentGameBettingInfos(RootModel):
@@ -85,3 +81,68 @@ class CurrentGameBettingInfos(RootModel):
     @property
     def dates(self) -> List[str]:
         return list(self.root.keys())
+
+
+class LineMovementPoint(BaseModel):
+    recorded_at: datetime
+    home_spread: Optional[Decimal] = None
+    home_spread_odds: Optional[Decimal] = None
+    away_spread_odds: Optional[Decimal] = None
+    home_moneyline: Optional[Decimal] = None
+    away_moneyline: Optional[Decimal] = None
+    over_under: Optional[Decimal] = None
+    over_odds: Optional[Decimal] = None
+    under_odds: Optional[Decimal] = None
+
+    class Config:
+        alias_generator = to_camel
+        populate_by_name = True
+
+
+class LineMovementResponse(BaseModel):
+    game_id: str
+    points: List[LineMovementPoint]
+
+    class Config:
+        alias_generator = to_camel
+        populate_by_name = True
+
+
+class SlateSettlementResponse(BaseModel):
+    game_date: date
+    # one settlement job per game that still has pending bets
+    games: List[ProcessResponse]
+
+    class Config:
+        alias_generator = to_camel
+        populate_by_name = True
+
+
+class SettlementJobResponse(BaseModel):
+    id: int
+    game_id: str
+    # QUEUED, RUNNING, SUCCEEDED, NOT_ENDED or FAILED
+    status: str
+    attempts: int
+    bets: int
+    won: int
+    push: int
+    lost: int
+    paid_out: Decimal
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        alias_generator = to_camel
+        populate_by_name = True
+
+
+class SlateSettlementStatusResponse(BaseModel):
+    game_date: date
+    games: List[SettlementJobResponse]
+
+    class Config:
+        alias_generator = to_camel
+        populate_by_name = True
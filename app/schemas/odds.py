@@ -1,7 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime, date
 from decimal import Decimal
-from typing import Optional
+from typing import Optional, List
 from pydantic.alias_generators import to_camel
 
 
@@ -20,3 +20,92 @@ class UpdateOddsByTeamsRequest(BaseModel):
     class Config:
         alias_generator = to_camel
         populate_by_name = True
+
+
+class GameTeamsKey(BaseModel):
+    home_team: str
+    away_team: str
+    game_date: date
+
+    class Config:
+        alias_generator = to_camel
+        populate_by_name = True
+
+
+class BatchUpdateOddsRequest(BaseModel):
+    game_ids: List[str] = []
+    games: List[GameTeamsKey] = []
+
+    class Config:
+        alias_generator = to_camel
+        populate_by_name = True
+        json_schema_extra = {
+            "example": {
+                "gameIds": ["0022400123", "0022400124"],
+                "games": [
+                    {
+                        "homeTeam": "Orlando Magic",
+                        "awayTeam": "Atlanta Hawks",
+                        "gameDate": "2025-04-15",
+                    }
+                ],
+            }
+        }
+
+
+class OddsIngestItem(BaseModel):
+    # identify the game either by game_id or by teams and date
+    game_id: Optional[str] = None
+    home_team: Optional[str] = None
+    away_team: Optional[str] = None
+    game_date: Optional[date] = None
+
+    # new odds; omitted fields are left unchanged
+    home_spread: Optional[Decimal] = None
+    home_spread_odds: Optional[Decimal] = None
+    away_spread_odds: Optional[Decimal] = None
+    home_moneyline: Optional[Decimal] = None
+    away_moneyline: Optional[Decimal] = None
+    over_under: Optional[Decimal] = None
+    over_odds: Optional[Decimal] = None
+    under_odds: Optional[Decimal] = None
+
+    class Config:
+        alias_generator = to_camel
+        populate_by_name = True
+
+    @model_validator(mode="after")
+    def check_game_key(self):
+        if not self.game_id and not (
+            self.home_team and self.away_team and self.game_date
+        ):
+            raise ValueError("gameId or homeTeam, awayTeam and gameDate are required")
+        return self
+
+
+class IngestOddsRequest(BaseModel):
+    games: List[OddsIngestItem]
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "games": [
+                    {
+                        "gameId": "0022400123",
+                        "homeSpread": -4.5,
+                        "homeSpreadOdds": -110,
+                        "awaySpreadOdds": -110,
+                        "overUnder": 224.5,
+                        "overOdds": -115,
+                        "underOdds": -105,
+                    },
+                    {
+                        "homeTeam": "Orlando Magic",
+                        "awayTeam": "Atlanta Hawks",
+                        "gameDate": "2025-04-15",
+                        "homeMoneyline": -180,
+                        "awayMoneyline": 150,
+                    },
+                ]
+            }
+        }
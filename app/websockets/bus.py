@@ -0,0 +1,314 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from abc import ABC, abstractmethod
+import asyncio
+import base64
+import glob
+import logging
+import os
+import socket
+import threading
+import zlib
+import psycopg2
+import psycopg2.extensions
+from app.websockets.encoding import encode_json, decode_json
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# memory (single process), unix (several workers on one host) or postgres
+ODDS_BUS = os.getenv("ODDS_BUS", "memory")
+ODDS_BUS_SOCKET_DIR = os.getenv("ODDS_BUS_SOCKET_DIR", "/tmp/courtside-odds-bus")
+ODDS_BUS_CHANNEL = os.getenv("ODDS_BUS_CHANNEL", "odds_updates")
+
+# Postgres NOTIFY payloads must be shorter than 8000 bytes
+PG_NOTIFY_MAX_PAYLOAD = 7999
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    return encode_json(message)
+
+
+def decode_message(data: bytes) -> Dict[str, Any]:
+    return decode_json(data)
+
+
+class BroadcastBus(ABC):
+    """Carries broadcast messages to every worker, including the publisher.
+
+    Every worker runs its own bus and hands each message it receives to
+    `handler`, which fans it out to that worker's sockets.
+    """
+
+    name = "base"
+
+    def __init__(self, handler: Handler):
+        self.handler = handler
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def start(self):
+        # messages are handed to the manager in order by a single task
+        self._queue = asyncio.Queue()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+
+    @abstractmethod
+    async def publish(self, message: Dict[str, Any]):
+        """Send a message to every worker's handler"""
+
+    def _received(self, message: Dict[str, Any]):
+        self.received += 1
+        self._queue.put_nowait(message)
+
+    async def _dispatch(self):
+        while True:
+            message = await self._queue.get()
+            try:
+                await self.handler(message)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error handling bus message: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "published": self.published,
+            "received": self.received,
+            "errors": self.errors,
+        }
+
+
+class InProcessBus(BroadcastBus):
+    """Single worker: messages go straight to the local sockets"""
+
+    name = "memory"
+
+    async def start(self):
+        pass
+
+    async def publish(self, message: Dict[str, Any]):
+        self.published += 1
+        self.received += 1
+        await self.handler(message)
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, bus: "LocalSocketBus"):
+        self.bus = bus
+
+    def datagram_received(self, data, addr):
+        try:
+            self.bus._received(decode_message(data))
+        except ValueError as e:
+            self.bus.errors += 1
+            logger.error(f"Invalid bus datagram: {e}")
+
+
+class LocalSocketBus(BroadcastBus):
+    """Workers on the same host. Each worker binds a Unix datagram socket in
+    a shared directory and a publish sends the message to every socket there.
+    """
+
+    name = "unix"
+
+    def __init__(self, handler: Handler, socket_dir: str = ODDS_BUS_SOCKET_DIR):
+        super().__init__(handler)
+        self.socket_dir = socket_dir
+        self.path = os.path.join(socket_dir, f"{os.getpid()}.sock")
+        self._transport = None
+        self._sender: Optional[socket.socket] = None
+
+    async def start(self):
+        await super().start()
+        os.makedirs(self.socket_dir, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DatagramProtocol(self),
+            family=socket.AF_UNIX,
+            local_addr=self.path,
+        )
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+
+    async def stop(self):
+        await super().stop()
+        if self._transport:
+            self._transport.close()
+            self._transport = None
+        if self._sender:
+            self._sender.close()
+            self._sender = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def publish(self, message: Dict[str, Any]):
+        data = encode_message(message)
+        self.published += 1
+        for path in glob.glob(os.path.join(self.socket_dir, "*.sock")):
+            try:
+                self._sender.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # worker is gone, clean up its socket
+                if path != self.path:
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+            except OSError as e:
+                self.errors += 1
+                logger.error(f"Could not send bus message to {path}: {e}")
+
+
+class PostgresNotifyBus(BroadcastBus):
+    """Workers on any host, using LISTEN/NOTIFY on the app's database"""
+
+    name = "postgres"
+
+    def __init__(
+        self,
+        handler: Handler,
+        dsn: Optional[str] = None,
+        channel: str = ODDS_BUS_CHANNEL,
+    ):
+        super().__init__(handler)
+        dsn = dsn or os.getenv("DATABASE_URL")
+        # psycopg2 understands postgresql:// URIs but not SQLAlchemy driver names
+        self.dsn = dsn.replace("postgresql+psycopg2://", "postgresql://")
+        self.channel = channel
+        self._listener = None
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await super().start()
+        await self._listen()
+
+    async def stop(self):
+        await super().stop()
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        self._close_listener()
+        if self._publisher is not None:
+            self._publisher.close()
+            self._publisher = None
+
+    async def _listen(self):
+        conn = await asyncio.to_thread(psycopg2.connect, self.dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        self._listener = conn
+        asyncio.get_running_loop().add_reader(conn.fileno(), self._on_readable)
+
+    def _close_listener(self):
+        if self._listener is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._listener.fileno())
+        except Exception:
+            pass
+        self._listener.close()
+        self._listener = None
+
+    def _on_readable(self):
+        try:
+            self._listener.poll()
+        except Exception as e:
+            logger.error(f"Lost odds bus LISTEN connection: {e}")
+            self._close_listener()
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+            return
+        while self._listener.notifies:
+            notify = self._listener.notifies.pop(0)
+            try:
+                self._received(self._decode_payload(notify.payload))
+            except (ValueError, zlib.error) as e:
+                self.errors += 1
+                logger.error(f"Invalid bus notification: {e}")
+
+    async def _reconnect(self):
+        delay = 1
+        while self._listener is None:
+            await asyncio.sleep(delay)
+            try:
+                await self._listen()
+            except Exception as e:
+                logger.error(f"Could not reconnect odds bus: {e}")
+                delay = min(delay * 2, 30)
+
+    @staticmethod
+    def _encode_payload(message: Dict[str, Any]) -> str:
+        # compressed so a full slate usually fits in a single notification
+        return base64.b64encode(zlib.compress(encode_message(message))).decode()
+
+    @staticmethod
+    def _decode_payload(payload: str) -> Dict[str, Any]:
+        return decode_message(zlib.decompress(base64.b64decode(payload)))
+
+    def _notify(self, payload: str):
+        with self._publish_lock:
+            if self._publisher is None or self._publisher.closed:
+                self._publisher = psycopg2.connect(self.dsn)
+                self._publisher.autocommit = True
+            try:
+                with self._publisher.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+            except psycopg2.OperationalError:
+                self._publisher.close()
+                self._publisher = None
+                raise
+
+    @staticmethod
+    def _encode_payloads(message: Dict[str, Any]) -> List[str]:
+        """The message as one or more NOTIFY payloads. A batch too large for
+        one notification is split into smaller batches, each of which is
+        delivered on its own"""
+        payload = PostgresNotifyBus._encode_payload(message)
+        if len(payload) <= PG_NOTIFY_MAX_PAYLOAD:
+            return [payload]
+        games = message.get("games") or []
+        if len(games) < 2:
+            raise ValueError(
+                f"Odds bus message too large for NOTIFY ({len(payload)} bytes)"
+            )
+        half = len(games) // 2
+        return PostgresNotifyBus._encode_payloads(
+            {**message, "games": games[:half]}
+        ) + PostgresNotifyBus._encode_payloads({**message, "games": games[half:]})
+
+    async def publish(self, message: Dict[str, Any]):
+        try:
+            payloads = self._encode_payloads(message)
+        except ValueError:
+            self.errors += 1
+            raise
+        for payload in payloads:
+            await asyncio.to_thread(self._notify, payload)
+            self.published += 1
+
+
+BUS_BACKENDS = {
+    InProcessBus.name: InProcessBus,
+    LocalSocketBus.name: LocalSocketBus,
+    PostgresNotifyBus.name: PostgresNotifyBus,
+}
+
+
+def create_bus(handler: Handler, backend: str = ODDS_BUS) -> BroadcastBus:
+    if backend not in BUS_BACKENDS:
+        raise ValueError(f"Unknown odds bus backend: {backend}")
+    return BUS_BACKENDS[backend](handler)
@@ -0,0 +1,109 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 0 disables coalescing: every notification is read and broadcast right away
+ODDS_COALESCE_WINDOW_MS = int(os.getenv("ODDS_COALESCE_WINDOW_MS", "0"))
+# seconds shutdown waits for the windows it flushes early before cancelling them
+ODDS_COALESCE_CLOSE_TIMEOUT = float(os.getenv("ODDS_COALESCE_CLOSE_TIMEOUT", "5"))
+
+
+class NotificationCoalescer:
+    """Collapses bursts of notifications for the same key.
+
+    The first notification for a key opens a window. Notifications arriving
+    before it closes are merged into it, and when it closes `flush` runs once,
+    so the latest state is read and broadcast a single time.
+
+    `aclose` closes every open window at once on shutdown, so merged
+    notifications are still broadcast.
+    """
+
+    def __init__(
+        self,
+        window_ms: int = ODDS_COALESCE_WINDOW_MS,
+        close_timeout: float = ODDS_COALESCE_CLOSE_TIMEOUT,
+    ):
+        self.window = window_ms / 1000
+        self.close_timeout = close_timeout
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+        # every window's task, until its flush has finished
+        self._tasks: Set[asyncio.Task] = set()
+        self._closing = asyncio.Event()
+
+        # metrics
+        self.received = 0
+        self.merged = 0
+        self.flushed = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def submit(self, key: Hashable, flush: Callable[[], Awaitable[Any]]) -> bool:
+        """Schedule `flush` for the end of the key's window. Returns True if
+        the notification was merged into a window that was already open"""
+        self.received += 1
+        if key in self._pending:
+            self.merged += 1
+            return True
+        task = asyncio.create_task(self._flush_later(key, flush))
+        self._pending[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return False
+
+    async def aclose(self):
+        """Flush every open window now and wait for the flushes, cancelling
+        any still running after close_timeout. Call it while the database and
+        the broadcast bus are still up."""
+        self._closing.set()
+        try:
+            if not self._tasks:
+                return
+            _, unfinished = await asyncio.wait(
+                list(self._tasks), timeout=self.close_timeout
+            )
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+            if unfinished:
+                logger.warning(
+                    f"Cancelled {len(unfinished)} coalesced notifications on shutdown"
+                )
+        finally:
+            # the app can be started again in the same process (eg. tests)
+            self._closing.clear()
+
+    async def _flush_later(self, key: Hashable, flush: Callable[[], Awaitable[Any]]):
+        try:
+            # the window's end, or shutdown, whichever comes first
+            await asyncio.wait_for(self._closing.wait(), self.window)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            # notifications from here on open a new window
+            self._pending.pop(key, None)
+        try:
+            await flush()
+            self.flushed += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error flushing coalesced notification {key}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": int(self.window * 1000),
+            "received": self.received,
+            "merged": self.merged,
+            "flushed": self.flushed,
+            "pending": len(self._pending),
+            "errors": self.errors,
+        }
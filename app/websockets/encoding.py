@@ -0,0 +1,54 @@
+from typing import Any, Dict, Union
+import msgpack
+import orjson
+from datetime import date, datetime
+from decimal import Decimal
+
+# Wire formats a client can ask for with /ws/odds?format=...
+JSON = "json"
+MSGPACK = "msgpack"
+FORMATS = (JSON, MSGPACK)
+
+
+def _default(obj):
+    # only reached for types the encoders don't support natively; payloads
+    # dumped with model_dump(mode="json") never get here
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def encode_json(payload: Any) -> bytes:
+    return orjson.dumps(payload, default=_default)
+
+
+def decode_json(data: Union[bytes, str]) -> Any:
+    return orjson.loads(data)
+
+
+def encode_msgpack(payload: Any) -> bytes:
+    return msgpack.packb(payload, default=_default)
+
+
+class Frame:
+    """A payload that is encoded at most once per wire format, however many
+    clients it is sent to"""
+
+    __slots__ = ("payload", "_encoded")
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.payload = payload
+        self._encoded: Dict[str, Union[str, bytes]] = {}
+
+    def encode(self, fmt: str = JSON) -> Union[str, bytes]:
+        """JSON frames are text, MessagePack frames are binary"""
+        encoded = self._encoded.get(fmt)
+        if encoded is None:
+            if fmt == MSGPACK:
+                encoded = encode_msgpack(self.payload)
+            else:
+                encoded = encode_json(self.payload).decode()
+            self._encoded[fmt] = encoded
+        return encoded
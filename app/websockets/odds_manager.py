@@ -1,64 +1,598 @@
 from fastapi import WebSocket
-from typing import Set, Dict, Any
-import json
+from typing import Set, Dict, Any, Optional, Tuple, Iterable, Deque, List
+from collections import deque
+import asyncio
+import logging
+import os
+import time
 from app.schemas.game import GameResponse
-from datetime import date, datetime
-from decimal import Decimal
+from app.core.cache import todays_odds_cache
+from app.core.http_cache import game_responses
+from app.crud.game import game_serializer
+from app.db.session import SessionLocal
+from app.websockets.bus import BroadcastBus, create_bus
+from app.websockets.encoding import Frame, FORMATS, JSON, MSGPACK, decode_json
+from datetime import date
 
+logger = logging.getLogger(__name__)
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return str(obj)
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        if isinstance(obj, date):
-            return obj.isoformat()
-        return super(DecimalEncoder, self).default(obj)
+# Max frames buffered per connection before it is treated as a slow consumer
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+# How many overflows a connection gets (each answered with a RESYNC marker)
+# before it is dropped
+WS_MAX_OVERFLOWS = int(os.getenv("WS_MAX_OVERFLOWS", "3"))
+# Seconds between PING frames sent to clients on the newer protocol (0
+# disables the heartbeat)
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))
+# A client is reaped if a send has been stuck this long, or if it answers
+# heartbeats and hasn't sent anything for this long
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60"))
+# Seconds a dropped client gets to finish the close handshake
+WS_CLOSE_TIMEOUT = float(os.getenv("WS_CLOSE_TIMEOUT", "2"))
+
+RESYNC_FRAME = Frame({"type": "RESYNC"})
+
+# Clients connecting with /ws/odds?mode=delta get SNAPSHOT/ODDS_DELTA frames
+DELTA_MODE = "delta"
+
+# (kind, value), eg. ("game", "0022400123"), ("date", "2025-04-15"), ("team", "orlando magic")
+Topic = Tuple[str, str]
+
+# subscribe/unsubscribe message keys -> topic kind
+TOPIC_KINDS = {"gameIds": "game", "dates": "date", "teams": "team"}
+
+
+def make_topic(kind: str, value: Any) -> Topic:
+    if isinstance(value, date):
+        value = value.isoformat()
+    value = str(value)
+    if kind == "team":
+        value = value.lower()
+    return (kind, value)
+
+
+def game_topics(game_id: Optional[str], game_data: Dict[str, Any]) -> Set[Topic]:
+    """Every topic an update for this game should be delivered to"""
+    topics = set()
+    game_id = game_id or game_data.get("gameId")
+    if game_id:
+        topics.add(make_topic("game", game_id))
+    if game_data.get("gameDate"):
+        topics.add(make_topic("date", game_data["gameDate"]))
+    for key in ("homeTeam", "awayTeam"):
+        if game_data.get(key):
+            topics.add(make_topic("team", game_data[key]))
+    return topics
+
+
+class ClientConnection:
+    """A connected socket with its own bounded outbound queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, max_queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.writer_task: Optional[asyncio.Task] = None
+        self.overflows = 0
+        self.frames_dropped = 0
+        # no topics means the client gets every update
+        self.topics: Set[Topic] = set()
+        # delta clients only get the fields that changed since the last frame
+        self.delta = websocket.query_params.get("mode") == DELTA_MODE
+        self.format = websocket.query_params.get("format", JSON)
+        if self.format not in FORMATS:
+            self.format = JSON
+        # Opted into the frames added after ODDS_UPDATE/ODDS_BATCH_UPDATE (eg.
+        # PING), by a query parameter or by sending a well-formed message. The
+        # original frontend does neither, so it only gets frames it knows
+        self.negotiated = self.delta or self.format != JSON
+        # clients that have answered a PING are expected to keep answering
+        self.heartbeats = False
+        self.last_seen = time.monotonic()
+        # set while a send is in flight
+        self.sending_since: Optional[float] = None
+        # set once the client has been dropped, its close may still be running
+        self.closed = False
+
+    def enqueue(self, frame: Frame) -> bool:
+        """Queue a frame without blocking. Returns False if the queue overflowed"""
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        # Slow consumer: throw away everything it hasn't read yet and tell it
+        # to resync instead of letting stale frames pile up
+        self.overflows += 1
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.frames_dropped += 1
+        self.frames_dropped += 1
+        self.queue.put_nowait(RESYNC_FRAME)
+        return False
 
 
 class OddsWebSocketManager:
-    def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
+    def __init__(
+        self,
+        max_queue_size: int = WS_SEND_QUEUE_SIZE,
+        max_overflows: int = WS_MAX_OVERFLOWS,
+        heartbeat_interval: float = WS_HEARTBEAT_INTERVAL,
+        idle_timeout: float = WS_IDLE_TIMEOUT,
+        close_timeout: float = WS_CLOSE_TIMEOUT,
+        bus: Optional[BroadcastBus] = None,
+    ):
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        # topic -> clients subscribed to it
+        self.subscriptions: Dict[Topic, Set[ClientConnection]] = {}
+        # clients without any subscription
+        self.firehose: Set[ClientConnection] = set()
+        self.max_queue_size = max_queue_size
+        self.max_overflows = max_overflows
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.close_timeout = close_timeout
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # closes of dropped clients still in flight
+        self._closing: Set[asyncio.Task] = set()
+
+        # last state sent for each game (keyed by the db id) and its sequence
+        # number, used for deltas and for snapshots on (re)connect
+        self.game_states: Dict[str, Dict[str, Any]] = {}
+        self.game_seqs: Dict[str, int] = {}
+
+        # broadcasts are published on the bus and every worker (this one
+        # included) delivers them to its own sockets in deliver()
+        self.bus = bus or create_bus(self.deliver)
+
+        # metrics
+        self.frames_enqueued = 0
+        self.frames_dropped = 0
+        self.resyncs_sent = 0
+        self.slow_consumers_dropped = 0
+        self.idle_connections_reaped = 0
+        self.connects = 0
+        self.disconnects = 0
+        # timestamps of the last minute's connects/disconnects
+        self._recent_connects: Deque[float] = deque()
+        self._recent_disconnects: Deque[float] = deque()
+        self.sends = 0
+        self.send_seconds = 0.0
+        self.bytes_out = 0
+
+    async def start(self):
+        await self.bus.start()
+        # after joining the bus, so no update between loading and joining is lost
+        self._load_slate()
+        if self.heartbeat_interval > 0:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        await asyncio.gather(*self._closing, return_exceptions=True)
+        await self.bus.stop()
+
+    def _load_slate(self):
+        """Seed game states from today's slate (warming its cache too), so
+        snapshots sent after a restart aren't empty"""
+        db = SessionLocal()
+        try:
+            betting_infos = todays_odds_cache.get(db)
+        except Exception as e:
+            logger.error(f"Could not load today's slate for snapshots: {str(e)}")
+            return
+        finally:
+            db.close()
+        for games in betting_infos.root.values():
+            for game_data in game_serializer.dump_jsonable(games):
+                key = str(game_data["id"])
+                # anything delivered meanwhile is newer
+                if key in self.game_states or game_data.get("hasEnded"):
+                    continue
+                self.game_states[key] = game_data
+                self.game_seqs.setdefault(key, 0)
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.add(websocket)
-        print(f"Client connected. Total connections: {len(self.active_connections)}")
+        client = ClientConnection(websocket, self.max_queue_size)
+        client.writer_task = asyncio.create_task(self._writer(client))
+        self.active_connections[websocket] = client
+        self.firehose.add(client)
+        self.connects += 1
+        self._record(self._recent_connects)
+        if client.delta:
+            client.enqueue(self._snapshot_frame(client))
 
     async def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        print(f"Client disconnected. Total connections: {len(self.active_connections)}")
+        self._remove(websocket)
+
+    def _remove(self, websocket: WebSocket):
+        client = self.active_connections.pop(websocket, None)
+        if client is None:
+            # already removed (eg. dropped as a slow consumer)
+            return
+        client.closed = True
+        self.frames_dropped += client.frames_dropped + client.queue.qsize()
+        self.firehose.discard(client)
+        self._unsubscribe(client, set(client.topics))
+        if client.writer_task and client.writer_task is not asyncio.current_task():
+            client.writer_task.cancel()
+        self.disconnects += 1
+        self._record(self._recent_disconnects)
+
+    async def handle_client_message(self, websocket: WebSocket, message: str):
+        """Handle a subscribe/unsubscribe/resync message sent by the client, eg.
+
+        {"action": "subscribe", "gameIds": ["0022400123"], "dates": ["2025-04-15"], "teams": ["Orlando Magic"]}
+        {"action": "resync"}
+        {"action": "pong"}
+        """
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        client.last_seen = time.monotonic()
+        try:
+            request = decode_json(message)
+            action = request["action"]
+            topics = {
+                make_topic(kind, value)
+                for key, kind in TOPIC_KINDS.items()
+                for value in request.get(key) or []
+            }
+        except (ValueError, KeyError, TypeError, AttributeError):
+            client.enqueue(Frame({"type": "ERROR", "message": "Invalid message"}))
+            return
+
+        client.negotiated = True
+        if action == "pong":
+            client.heartbeats = True
+            return
+        elif action == "resync":
+            # client saw a gap in the sequence numbers
+            client.enqueue(self._snapshot_frame(client))
+            return
+        elif action == "subscribe":
+            self._subscribe(client, topics)
+        elif action == "unsubscribe":
+            self._unsubscribe(client, topics)
+        else:
+            client.enqueue(
+                Frame({"type": "ERROR", "message": f"Unknown action: {action}"})
+            )
+            return
+
+        client.enqueue(
+            Frame(
+                {
+                    "type": "SUBSCRIPTIONS",
+                    "topics": [
+                        {"kind": k, "value": v} for k, v in sorted(client.topics)
+                    ],
+                }
+            )
+        )
+
+    def _subscribe(self, client: ClientConnection, topics: Iterable[Topic]):
+        for topic in topics:
+            client.topics.add(topic)
+            self.subscriptions.setdefault(topic, set()).add(client)
+        if client.topics:
+            self.firehose.discard(client)
+
+    def _unsubscribe(self, client: ClientConnection, topics: Iterable[Topic]):
+        for topic in topics:
+            client.topics.discard(topic)
+            subscribers = self.subscriptions.get(topic)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.subscriptions[topic]
+        if not client.topics and client.websocket in self.active_connections:
+            self.firehose.add(client)
+
+    def _recipients(self, topics: Set[Topic]) -> Set[ClientConnection]:
+        recipients = set(self.firehose)
+        for topic in topics:
+            recipients |= self.subscriptions.get(topic, set())
+        return recipients
 
     async def broadcast_odds_update(self, game_id: str, game_data: dict):
-        payload = {"type": "ODDS_UPDATE", "gameId": game_id, "data": game_data}
-        await self._broadcast_message(payload)
+        await self.bus.publish(
+            {"type": "ODDS_UPDATE", "gameId": game_id, "data": game_data}
+        )
 
     async def broadcast_odds_update_by_teams(
         self, home_team: str, away_team: str, game_date: str, game_data: GameResponse
     ):
+        await self.bus.publish(
+            {
+                "type": "ODDS_UPDATE_BY_TEAMS",
+                "homeTeam": home_team,
+                "awayTeam": away_team,
+                "gameDate": game_date,
+                "data": game_data,
+            }
+        )
+
+    async def broadcast_odds_batch_update(self, games: List[Dict[str, Any]]):
+        """One combined frame for many games (eg. a full-slate line refresh)"""
+        await self.bus.publish({"type": "ODDS_BATCH_UPDATE", "games": games})
+
+    async def publish_games_changed(self, game_date: Optional[date] = None):
+        """Tell every worker that a game was changed outside of an odds update
+        (game id set, game ended, bets settled). Publish after committing."""
+        await self.bus.publish(
+            {
+                "type": "GAMES_CHANGED",
+                "gameDate": game_date.isoformat() if game_date else None,
+            }
+        )
+
+    async def deliver(self, message: Dict[str, Any]):
+        """Fan a bus message out to this worker's sockets"""
+        # every message is a committed change to games, which the /api/games
+        # versions can miss (eg. odds the scraper wrote without updated_at)
+        game_responses.invalidate()
+        if message["type"] == "ODDS_UPDATE":
+            todays_odds_cache.invalidate(message["data"]["gameDate"])
+            await self._deliver_odds_update(message["gameId"], message["data"])
+        elif message["type"] == "ODDS_UPDATE_BY_TEAMS":
+            todays_odds_cache.invalidate(message["data"]["gameDate"])
+            await self._deliver_odds_update_by_teams(
+                message["homeTeam"],
+                message["awayTeam"],
+                message["gameDate"],
+                message["data"],
+            )
+        elif message["type"] == "ODDS_BATCH_UPDATE":
+            # ISO dates sort chronologically
+            todays_odds_cache.invalidate(min(g["gameDate"] for g in message["games"]))
+            await self._deliver_odds_batch_update(message["games"])
+        elif message["type"] == "GAMES_CHANGED":
+            todays_odds_cache.invalidate(message["gameDate"])
+        else:
+            raise ValueError(f"Unknown bus message type: {message['type']}")
+
+    async def _deliver_odds_update(self, game_id: str, game_data: dict):
+        key, seq, changed = self._update_state(game_data)
+        payload = {
+            "type": "ODDS_UPDATE",
+            "gameId": game_id,
+            "seq": seq,
+            "data": game_data,
+        }
+        delta_payload = {
+            "type": "ODDS_DELTA",
+            "id": key,
+            "gameId": game_id,
+            "seq": seq,
+            "data": changed,
+        }
+        await self._broadcast_message(
+            payload, game_topics(game_id, game_data), delta_payload
+        )
+
+    async def _deliver_odds_update_by_teams(
+        self, home_team: str, away_team: str, game_date: str, game_data: dict
+    ):
+        key, seq, changed = self._update_state(game_data)
         payload = {
             "type": "ODDS_UPDATE_BY_TEAMS",
             "homeTeam": home_team,
             "awayTeam": away_team,
             "gameDate": game_date,
+            "seq": seq,
             "data": game_data,
         }
-        await self._broadcast_message(payload)
+        delta_payload = {
+            "type": "ODDS_DELTA",
+            "id": key,
+            "gameId": game_data.get("gameId"),
+            "seq": seq,
+            "data": changed,
+        }
+        topics = game_topics(None, game_data)
+        topics.add(make_topic("date", game_date))
+        topics.add(make_topic("team", home_team))
+        topics.add(make_topic("team", away_team))
+        await self._broadcast_message(payload, topics, delta_payload)
+
+    async def _deliver_odds_batch_update(self, games: List[Dict[str, Any]]):
+        updates = []
+        deltas = []
+        # which of the batch's games each subscriber holds
+        held: Dict[ClientConnection, Set[int]] = {}
+        for i, game_data in enumerate(games):
+            key, seq, changed = self._update_state(game_data)
+            game_id = game_data.get("gameId")
+            updates.append({"gameId": game_id, "seq": seq, "data": game_data})
+            deltas.append({"id": key, "gameId": game_id, "seq": seq, "data": changed})
+            for topic in game_topics(game_id, game_data):
+                for client in self.subscriptions.get(topic, ()):
+                    held.setdefault(client, set()).add(i)
+
+        # clients holding the same games share a frame, so each distinct
+        # subset is still encoded once per format
+        groups: Dict[Tuple[int, ...], List[ClientConnection]] = {}
+        if self.firehose:
+            groups[tuple(range(len(games)))] = list(self.firehose)
+        for client, indexes in held.items():
+            groups.setdefault(tuple(sorted(indexes)), []).append(client)
+        for indexes, clients in groups.items():
+            self._send(
+                clients,
+                {"type": "ODDS_BATCH_UPDATE", "games": [updates[i] for i in indexes]},
+                {"type": "ODDS_BATCH_DELTA", "games": [deltas[i] for i in indexes]},
+            )
+
+    def _update_state(
+        self, game_data: Dict[str, Any]
+    ) -> Tuple[str, int, Dict[str, Any]]:
+        """Record the latest state for a game. Returns its key, new sequence
+        number and the fields that changed since the previous state"""
+        key = str(game_data["id"])
+        previous = self.game_states.get(key, {})
+        changed = {
+            k: v for k, v in game_data.items() if k not in previous or previous[k] != v
+        }
+        seq = self.game_seqs.get(key, 0) + 1
+        self.game_seqs[key] = seq
+        if game_data.get("hasEnded"):
+            # nothing left to stream for this game
+            self.game_states.pop(key, None)
+        else:
+            self.game_states[key] = dict(game_data)
+        return key, seq, changed
 
-    async def _broadcast_message(self, payload: Dict[str, Any]):
-        dead_connections = set()
-        json_str = json.dumps(payload, cls=DecimalEncoder)
+    def _snapshot_frame(self, client: ClientConnection) -> Frame:
+        games = [
+            {"id": key, "seq": self.game_seqs[key], "data": state}
+            for key, state in self.game_states.items()
+            if not client.topics or game_topics(None, state) & client.topics
+        ]
+        return Frame({"type": "SNAPSHOT", "games": games})
 
-        for connection in self.active_connections:
+    async def _broadcast_message(
+        self,
+        payload: Dict[str, Any],
+        topics: Set[Topic],
+        delta_payload: Optional[Dict[str, Any]] = None,
+    ):
+        self._send(self._recipients(topics), payload, delta_payload)
+
+    def _send(
+        self,
+        clients: Iterable[ClientConnection],
+        payload: Dict[str, Any],
+        delta_payload: Optional[Dict[str, Any]] = None,
+    ):
+        # Only enqueues; every connection's writer task does the actual send.
+        # Frames are encoded lazily, once per format, by the first writer
+        frame = Frame(payload)
+        delta_frame = Frame(delta_payload) if delta_payload is not None else frame
+
+        slow_consumers = []
+        for client in clients:
+            if client.enqueue(delta_frame if client.delta else frame):
+                self.frames_enqueued += 1
+                continue
+            self.resyncs_sent += 1
+            if client.overflows > self.max_overflows:
+                slow_consumers.append(client)
+
+        for client in slow_consumers:
+            self.slow_consumers_dropped += 1
+            self._close_later(client, reason="Slow consumer")
+
+    async def _writer(self, client: ClientConnection):
+        try:
+            while True:
+                frame = await client.queue.get()
+                data = frame.encode(client.format)
+                client.sending_since = started = time.monotonic()
+                if client.format == MSGPACK:
+                    await client.websocket.send_bytes(data)
+                else:
+                    await client.websocket.send_text(data)
+                client.sending_since = None
+                self.sends += 1
+                self.send_seconds += time.monotonic() - started
+                self.bytes_out += len(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Error sending message: {e}")
+            await self.disconnect(client.websocket)
+
+    def _close_later(self, client: ClientConnection, reason: str):
+        """Drop a client without waiting on it: it stops getting frames now and
+        the close handshake runs in its own task, so a peer that stopped
+        reading can't stall the caller"""
+        self._remove(client.websocket)
+        task = asyncio.create_task(self._close(client, reason))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, client: ClientConnection, reason: str):
+        try:
+            await asyncio.wait_for(
+                client.websocket.close(code=1013, reason=reason), self.close_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out closing websocket ({reason})")
+        except Exception:
+            pass
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
             try:
-                await connection.send_text(
-                    json_str
-                )  # Use send_text instead of send_json
+                self._reap_idle()
+                self._send_pings()
             except Exception as e:
-                print(f"Error sending message: {e}")
-                dead_connections.add(connection)
+                logger.error(f"Error in websocket heartbeat: {e}")
+
+    def _send_pings(self):
+        ping = Frame({"type": "PING", "ts": time.time()})
+        for client in list(self.active_connections.values()):
+            if client.negotiated:
+                client.enqueue(ping)
+
+    def _reap_idle(self):
+        now = time.monotonic()
+        for client in list(self.active_connections.values()):
+            stalled = (
+                client.sending_since is not None
+                and now - client.sending_since > self.idle_timeout
+            )
+            silent = client.heartbeats and now - client.last_seen > self.idle_timeout
+            if stalled or silent:
+                self.idle_connections_reaped += 1
+                self._close_later(client, reason="Idle connection")
 
-        # Remove dead connections
-        for dead_connection in dead_connections:
-            self.active_connections.remove(dead_connection)
+    @staticmethod
+    def _record(timestamps: Deque[float]):
+        timestamps.append(time.monotonic())
+        OddsWebSocketManager._per_minute(timestamps)
+
+    @staticmethod
+    def _per_minute(timestamps: Deque[float]) -> int:
+        cutoff = time.monotonic() - 60
+        while timestamps and timestamps[0] < cutoff:
+            timestamps.popleft()
+        return len(timestamps)
+
+    def stats(self) -> Dict[str, Any]:
+        depths = [c.queue.qsize() for c in self.active_connections.values()]
+        return {
+            "connections": len(self.active_connections),
+            "connects_total": self.connects,
+            "disconnects_total": self.disconnects,
+            "connects_per_minute": self._per_minute(self._recent_connects),
+            "disconnects_per_minute": self._per_minute(self._recent_disconnects),
+            "sends": self.sends,
+            "avg_send_latency_ms": (
+                self.send_seconds / self.sends * 1000 if self.sends else 0
+            ),
+            "bytes_out": self.bytes_out,
+            "idle_connections_reaped": self.idle_connections_reaped,
+            "queue_capacity": self.max_queue_size,
+            "queue_depth_max": max(depths, default=0),
+            "queue_depth_avg": sum(depths) / len(depths) if depths else 0,
+            "queue_depth_total": sum(depths),
+            "frames_enqueued": self.frames_enqueued,
+            "frames_dropped": self.frames_dropped
+            + sum(c.frames_dropped for c in self.active_connections.values()),
+            "resyncs_sent": self.resyncs_sent,
+            "slow_consumers_dropped": self.slow_consumers_dropped,
+            "closes_in_flight": len(self._closing),
+            "topics": len(self.subscriptions),
+            "firehose_connections": len(self.firehose),
+            "delta_connections": sum(
+                1 for c in self.active_connections.values() if c.delta
+            ),
+            "games_tracked": len(self.game_states),
+            "bus": self.bus.stats(),
+        }
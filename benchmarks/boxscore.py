@@ -0,0 +1,123 @@
+"""Microbenchmark for reading the scores out of a boxscore.
+
+Compares parsing the whole document into dicts (what response.json() did)
+with validating just the scores from the bytes, which leaves the players
+and statistics as unconverted JSON. Reports time per document, peak Python
+heap, and checks both give the same scores. The boxscore is synthetic but
+shaped like the CDN's, with every field of the Team/Player/TeamStatistics
+schemas:
+
+    python benchmarks/boxscore.py --players 17 --repeat 200
+"""
+
+from typing import Any, Callable, Dict, Literal, get_args, get_origin
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import BaseModel
+from app.core.boxscore import parse_score
+from app.schemas.bet import BoxscoreScore, Period, Player, Team
+
+
+def sample(model: type, rng: random.Random, lists: Dict[type, int]) -> Dict[str, Any]:
+    """A dict with every field of the model filled in"""
+    out = {}
+    for name, field in model.model_fields.items():
+        out[name] = sample_value(field.annotation, rng, lists)
+    return out
+
+
+def sample_value(annotation: Any, rng: random.Random, lists: Dict[type, int]) -> Any:
+    origin = get_origin(annotation)
+    if origin is Literal:
+        return get_args(annotation)[0]
+    if origin is list:
+        (item,) = get_args(annotation)
+        return [sample_value(item, rng, lists) for _ in range(lists[item])]
+    if origin is not None:
+        # Optional[...]
+        return sample_value(get_args(annotation)[0], rng, lists)
+    if annotation is type(None):
+        return None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return sample(annotation, rng, lists)
+    if annotation is int:
+        return rng.randint(0, 60)
+    if annotation is float:
+        return round(rng.random(), 3)
+    return "".join(rng.choice("abcdefghij") for _ in range(8))
+
+
+def make_boxscore(players: int) -> bytes:
+    rng = random.Random(0)
+    lists = {Period: 4, Player: players}
+    home = sample(Team, rng, lists)
+    away = sample(Team, rng, lists)
+    game = {
+        "gameId": "0022400001",
+        "gameTimeLocal": "2024-10-22T19:30:00-04:00",
+        "gameStatusText": "Final",
+        "gameStatus": 3,
+        "period": 4,
+        "gameClock": "PT00M00.00S",
+        "attendance": 19156,
+        "arena": {"arenaName": "Arena", "arenaCity": "City"},
+        "officials": [{"name": "Official", "jerseyNum": "1"}] * 3,
+        "homeTeam": home,
+        "awayTeam": away,
+    }
+    return json.dumps({"meta": {"version": 1, "code": 200}, "game": game}).encode()
+
+
+# the code path this replaced
+
+
+def score_full(body: bytes) -> BoxscoreScore:
+    game = json.loads(body)["game"]
+    return BoxscoreScore.model_validate(game)
+
+
+def measure(fn: Callable[[bytes], BoxscoreScore], body: bytes, repeat: int) -> Dict:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(body)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak, "result": result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=17)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    body = make_boxscore(args.players)
+    old = measure(score_full, body, args.repeat)
+    new = measure(parse_score, body, args.repeat)
+    report = {
+        "document_bytes": len(body),
+        "before_ms": round(old["seconds"] * 1000, 3),
+        "after_ms": round(new["seconds"] * 1000, 3),
+        "speedup": round(old["seconds"] / new["seconds"], 2),
+        "before_peak_kb": round(old["peak_bytes"] / 1024, 1),
+        "after_peak_kb": round(new["peak_bytes"] / 1024, 1),
+        "same_output": old["result"] == new["result"],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Benchmark and equivalence check for the array bet-grading engine.
+
+First grades the same bets with BetCRUD.process_bet (one ORM bet and user
+at a time) and with app.core.grading for several final scores, including a
+tie and lines landing exactly on the margin and the total, and checks every
+status and user total matches. Then times the engine alone at larger sizes.
+The old path runs against an in-memory SQLite database:
+
+    python benchmarks/grading.py --check 5000 --sizes 10000 100000 1000000
+"""
+
+from typing import Dict, List, Tuple
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from app.db.base import Base
+from app.models.bet import Bet, BetType
+from app.models.game import Game
+from app.models.user import User
+from app.crud.bet import BetCRUD
+from app.core import grading
+
+# (home, away): home win, away win, tie
+SCORES = [(112, 105), (98, 104), (101, 101)]
+USERS = 500
+BET_TYPES = list(BetType)
+
+Row = Tuple[int, BetType, Decimal, Decimal, Decimal]
+
+
+def make_rows(n: int, home: int, away: int, rng: random.Random) -> List[Row]:
+    """(user_id, bet_type, betting_line, amount_placed, total_payout)"""
+    margin, total = home - away, home + away
+    rows = []
+    for _ in range(n):
+        bet_type = rng.choice(BET_TYPES)
+        if bet_type in (BetType.SPREAD_HOME, BetType.SPREAD_AWAY):
+            side = margin if bet_type == BetType.SPREAD_HOME else -margin
+            # lines on, either side of, and mirroring the final margin
+            line = Decimal(
+                rng.choice([-side, side, -side - 0.5, -side + 0.5, 0, 3.5, -7])
+            )
+        elif bet_type in (BetType.OVER, BetType.UNDER):
+            line = Decimal(rng.choice([total, total - 0.5, total + 0.5, 215.5]))
+        else:
+            line = rng.choice([None, Decimal(0)])
+        amount = Decimal(rng.randint(100, 50000)).scaleb(-2)
+        payout = (amount * Decimal(rng.choice(["1.91", "2.50", "1.40"]))).quantize(
+            Decimal("0.01")
+        )
+        rows.append((rng.randint(1, USERS), bet_type, line, amount, payout))
+    return rows
+
+
+def grade_before(
+    rows: List[Row], home: int, away: int
+) -> Tuple[List[str], Dict, float, List]:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(
+        engine, tables=[User.__table__, Game.__table__, Bet.__table__]
+    )
+    with Session(engine) as db:
+        db.add_all(
+            User(id=i, username=f"u{i}", password="x", balance=0, amount_won=0)
+            for i in range(1, USERS + 1)
+        )
+        bets = [
+            Bet(
+                id=i,
+                user_id=user_id,
+                game_id=1,
+                bet_type=bet_type,
+                odds=Decimal(-110),
+                amount_placed=amount,
+                total_payout=payout,
+                status="PENDING",
+                betting_line=line,
+            )
+            for i, (user_id, bet_type, line, amount, payout) in enumerate(rows, 1)
+        ]
+        db.add_all(bets)
+        db.flush()
+        # what the engine reads for the same bets
+        columns = db.execute(select(*grading.BET_COLUMNS).order_by(Bet.id)).all()
+        home_team = {"teamCity": "Home", "teamName": "Team", "score": home}
+        away_team = {"teamCity": "Away", "teamName": "Team", "score": away}
+
+        started = time.perf_counter()
+        for bet in bets:
+            BetCRUD.process_bet(db, bet, home_team, away_team)
+        db.flush()
+        seconds = time.perf_counter() - started
+
+        statuses = [bet.status for bet in bets]
+        users = {
+            user.id: (user.amount_won, user.bets_won, user.balance)
+            for user in db.query(User)
+            if user.bets_won or user.balance
+        }
+    return statuses, users, seconds, columns
+
+
+def grade_after(columns: List, home: int, away: int) -> Tuple[List[str], Dict]:
+    bets = grading.BetColumns.from_rows(columns)
+    outcome = grading.grade(bets, home, away)
+    credits = grading.credit_totals(bets, outcome)
+    statuses = [grading.STATUSES[code] for code in outcome]
+    users = {
+        int(user_id): (
+            grading.from_hundredths(amount_won),
+            int(bets_won),
+            grading.from_hundredths(credit),
+        )
+        for user_id, amount_won, bets_won, credit in zip(
+            credits.user_id, credits.amount_won, credits.bets_won, credits.credit
+        )
+    }
+    return statuses, users
+
+
+def check(n: int, rng: random.Random) -> Dict:
+    report = {}
+    for home, away in SCORES:
+        rows = make_rows(n, home, away, rng)
+        before, before_users, seconds, columns = grade_before(rows, home, away)
+        after, after_users = grade_after(columns, home, away)
+        report[f"{home}-{away}"] = {
+            "bets": n,
+            "process_bet_bets_per_sec": round(n / seconds),
+            "same_statuses": before == after,
+            "same_user_totals": before_users == after_users,
+        }
+
+    # spread and total bets without a line are left for later
+    columns = [(1, BetType.SPREAD_HOME, None, 100, 200)] * 2 + [
+        (1, BetType.OVER, None, 100, 200)
+    ]
+    outcome = grading.grade(grading.BetColumns.from_rows(columns), 100, 90)
+    report["null_lines_stay_pending"] = bool((outcome == grading.PENDING).all())
+    return report
+
+
+def measure(n: int, rng: random.Random, repeat: int) -> Dict:
+    home, away = SCORES[0]
+    columns = [
+        (
+            user_id,
+            bet_type,
+            None if line is None else grading.to_hundredths(line),
+            grading.to_hundredths(amount),
+            grading.to_hundredths(payout),
+        )
+        for user_id, bet_type, line, amount, payout in make_rows(n, home, away, rng)
+    ]
+    started = time.perf_counter()
+    bets = grading.BetColumns.from_rows(columns)
+    from_rows = time.perf_counter() - started
+
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        outcome = grading.grade(bets, home, away)
+        grading.credit_totals(bets, outcome)
+        best = min(best, time.perf_counter() - started)
+    return {
+        "bets": n,
+        "from_rows_ms": round(from_rows * 1000, 1),
+        "grade_and_credit_ms": round(best * 1000, 2),
+        "bets_per_sec": round(n / best),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--check", type=int, default=5000)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    # process_bet logs every bet
+    logging.disable(logging.INFO)
+
+    rng = random.Random(0)
+    report = {
+        "equivalence": check(args.check, rng),
+        "engine": [measure(n, rng, args.repeat) for n in args.sizes],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Microbenchmark for turning game and bet rows into response JSON.
+
+Compares the old per-row path (ORM objects, one model_validate per row, one
+extra query per bet for its game) with the RowSerializer path (column
+tuples, one TypeAdapter call per list), and checks both produce the same
+bytes. Runs against an in-memory SQLite database, or DATABASE_URL with
+--database-url (the tables are created and filled with throwaway rows, so
+never point it at a real database):
+
+    python benchmarks/serialization.py --games 5000 --bets 20000
+"""
+
+from typing import Callable, Dict, List
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.db.base import Base
+from app.models.bet import Bet, BetType
+from app.models.game import Game
+from app.models.user import User
+from app.schemas.bet import UserBetWithGameInfo
+from app.schemas.game import GameResponse
+from app.crud.bet import BetCRUD, user_bet_serializer
+from app.crud.game import GameCRUD, game_serializer
+
+
+def fill(db: Session, games: int, bets: int):
+    rng = random.Random(0)
+    now = datetime.now(timezone.utc)
+    db.add(User(id=1, username="bench", password="x"))
+    db.add_all(
+        Game(
+            id=i,
+            game_id=f"00224{i:05d}",
+            home_team=f"Home {i % 30}",
+            away_team=f"Away {i % 29}",
+            home_spread_odds=Decimal("-110.00"),
+            away_spread_odds=Decimal("-110.00"),
+            home_spread=Decimal(rng.randint(-30, 30)) / 2,
+            opening_home_spread=Decimal("-3.50"),
+            home_moneyline=Decimal(rng.randint(-400, 400)),
+            away_moneyline=Decimal(rng.randint(-400, 400)),
+            opening_over_under=Decimal("220.50"),
+            over_under=Decimal(rng.randint(420, 480)) / 2,
+            over_odds=Decimal("-110.00"),
+            under_odds=Decimal("-110.00"),
+            created_at=now,
+            updated_at=now,
+            game_date=date(2024, 10, 22) + timedelta(days=i // 8),
+            has_ended=i % 3 == 0,
+        )
+        for i in range(1, games + 1)
+    )
+    db.add_all(
+        Bet(
+            id=i,
+            user_id=1,
+            game_id=rng.randint(1, games),
+            bet_type=rng.choice(list(BetType)),
+            odds=Decimal(rng.choice([-110, -150, 120, 200])),
+            amount_placed=Decimal("25.00"),
+            total_payout=Decimal("47.73"),
+            placed_at=now - timedelta(minutes=i),
+            status="PENDING",
+            betting_line=Decimal(rng.randint(-20, 20)) / 2,
+        )
+        for i in range(1, bets + 1)
+    )
+    db.commit()
+
+
+# the code paths these replaced
+
+
+def games_before(db: Session) -> bytes:
+    games = db.query(Game).order_by(Game.game_date, Game.id).all()
+    models = [GameResponse.model_validate(game) for game in games]
+    return TypeAdapter(List[GameResponse]).dump_json(models, by_alias=True)
+
+
+def bets_before(db: Session) -> bytes:
+    bets = db.query(Bet).filter(Bet.user_id == 1).order_by(Bet.placed_at.desc()).all()
+    result = []
+    for bet in bets:
+        game = db.query(Game).filter(Game.id == bet.game_id).first()
+        if game:
+            result.append(
+                UserBetWithGameInfo.model_validate(
+                    {
+                        "id": bet.id,
+                        "user_id": bet.user_id,
+                        "game_id": game.game_id,
+                        "bet_type": bet.bet_type,
+                        "odds": float(bet.odds),
+                        "amount_placed": bet.amount_placed,
+                        "total_payout": bet.total_payout,
+                        "placed_at": bet.placed_at,
+                        "status": bet.status,
+                        "betting_line": bet.betting_line if bet.betting_line else None,
+                        "home_team": game.home_team,
+                        "away_team": game.away_team,
+                        "game_date": game.game_date,
+                    }
+                )
+            )
+    return TypeAdapter(List[UserBetWithGameInfo]).dump_json(result, by_alias=True)
+
+
+def games_after(db: Session) -> bytes:
+    return game_serializer.dump_json(GameCRUD.get_responses(db))
+
+
+def bets_after(db: Session) -> bytes:
+    return user_bet_serializer.dump_json(BetCRUD.get_user_bets(db, 1))
+
+
+def measure(engine, fn: Callable[[Session], bytes], rows: int, repeat: int) -> Dict:
+    best = float("inf")
+    body = b""
+    for _ in range(repeat):
+        # a fresh session each time so nothing comes from the identity map
+        with Session(engine) as db:
+            started = time.perf_counter()
+            body = fn(db)
+            best = min(best, time.perf_counter() - started)
+    return {"seconds": best, "rows_per_sec": rows / best, "body": body}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--bets", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    tables = [User.__table__, Game.__table__, Bet.__table__]
+    Base.metadata.drop_all(engine, tables=tables)
+    Base.metadata.create_all(engine, tables=tables)
+    with Session(engine) as db:
+        fill(db, args.games, args.bets)
+
+    report = {}
+    for name, before, after, rows in (
+        ("games", games_before, games_after, args.games),
+        ("bets", bets_before, bets_after, args.bets),
+    ):
+        old = measure(engine, before, rows, args.repeat)
+        new = measure(engine, after, rows, args.repeat)
+        report[name] = {
+            "rows": rows,
+            "before_rows_per_sec": round(old["rows_per_sec"]),
+            "after_rows_per_sec": round(new["rows_per_sec"]),
+            "speedup": round(old["seconds"] / new["seconds"], 2),
+            "same_output": old["body"] == new["body"],
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
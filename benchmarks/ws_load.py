@@ -0,0 +1,351 @@
+"""Load test for /ws/odds fan-out.
+
+Opens N simulated odds subscribers, fires /notify-odds-update at a fixed rate
+and reports how long each update took to reach every client.
+
+Against an app that is already running:
+
+    python benchmarks/ws_load.py --url http://localhost:8000 --game-id 0022400123 --clients 2000
+
+Or let the harness start uvicorn itself against a local database (memory
+per connection is only reported in this mode):
+
+    DATABASE_URL=postgresql://localhost/courtside python benchmarks/ws_load.py \\
+        --spawn --game-id 0022400123 --clients 2000 --slow-pct 10
+
+Notifications are matched to frames by their sequence number, so the app must
+run with ODDS_COALESCE_WINDOW_MS=0 (the default, and what --spawn uses).
+
+The server's counters come from /api/internal/stats/websocket, with the
+app's INTERNAL_API_TOKEN taken from the environment (--spawn makes one up if
+it isn't set). Without it they're left out of the report.
+
+Slow clients buffer only a few frames (--slow-queue) on a small socket
+receive buffer (--slow-rcvbuf), so once those fill up the server's sends
+block and its per-connection queue overflows the way it would for a real
+slow phone. The report breaks frames missed, RESYNCs and drops down by fast
+and slow clients. A slow client still reading its backlog when the run stops
+hasn't seen its RESYNC or close frame yet, so the server's frames_dropped,
+resyncs_sent and slow_consumers_dropped are the counts to go by. Over loopback
+the kernel's send buffers hold a few MB per connection before the server sees
+any pushback, so it takes thousands of notifications to get there.
+"""
+
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+import httpx
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+# close code the server uses when it drops a slow consumer
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+DEFAULT_ORIGINS = ["http://localhost:3000"]
+STATS_PATH = "/api/internal/stats/websocket"
+
+
+class Subscriber:
+    def __init__(
+        self,
+        index: int,
+        origin: str,
+        slow_delay: float,
+        max_queue: Optional[int] = None,
+        rcvbuf: Optional[int] = None,
+    ):
+        self.index = index
+        self.origin = origin
+        self.slow_delay = slow_delay
+        # frames buffered before the client stops reading from the socket,
+        # None for fast clients so they never push back
+        self.max_queue = max_queue
+        # SO_RCVBUF in bytes, None for the OS default
+        self.rcvbuf = rcvbuf
+        # seq -> monotonic time the frame arrived
+        self.received: Dict[int, float] = {}
+        self.resyncs = 0
+        self.close_code: Optional[int] = None
+        self.error: Optional[str] = None
+
+    @property
+    def dropped(self) -> bool:
+        """Closed by the server as a slow consumer"""
+        return self.close_code == SLOW_CONSUMER_CLOSE_CODE
+
+    async def open_socket(self, ws_url: str) -> Optional[socket.socket]:
+        if self.rcvbuf is None:
+            return None
+        url = urlsplit(ws_url)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # set before connecting, so the TCP window is negotiated with it
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(
+            sock, (url.hostname, url.port or 80)
+        )
+        return sock
+
+    async def run(self, ws_url: str, connected: asyncio.Event, stop: asyncio.Event):
+        try:
+            sock = await self.open_socket(ws_url)
+            async with connect(
+                ws_url, origin=self.origin, max_queue=self.max_queue, sock=sock
+            ) as ws:
+                connected.set()
+                while not stop.is_set():
+                    try:
+                        message = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                    except asyncio.TimeoutError:
+                        continue
+                    now = time.monotonic()
+                    frame = json.loads(message)
+                    if frame["type"] == "ODDS_UPDATE":
+                        self.received[frame["seq"]] = now
+                    elif frame["type"] == "RESYNC":
+                        self.resyncs += 1
+                    if self.slow_delay:
+                        await asyncio.sleep(self.slow_delay)
+        except ConnectionClosed as e:
+            self.close_code = e.rcvd.code if e.rcvd else None
+            connected.set()
+        except Exception as e:
+            self.error = str(e)
+            connected.set()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def rss_kb(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def spawn_app(port: int, token: str) -> subprocess.Popen:
+    env = dict(os.environ, ODDS_COALESCE_WINDOW_MS="0", INTERNAL_API_TOKEN=token)
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--ws",
+            "websockets",
+            "--log-level",
+            "warning",
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    return process
+
+
+async def wait_until_up(http: httpx.AsyncClient, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await http.get(STATS_PATH)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("App did not start")
+
+
+async def notify(http: httpx.AsyncClient, game_id: str):
+    response = await http.post("/notify-odds-update", json={"gameId": game_id})
+    response.raise_for_status()
+
+
+async def run(args) -> Dict:
+    token = os.getenv("INTERNAL_API_TOKEN")
+    if args.spawn:
+        token = token or secrets.token_urlsafe()
+    process = spawn_app(args.port, token) if args.spawn else None
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    base_url = f"http://127.0.0.1:{args.port}" if args.spawn else args.url
+    ws_url = base_url.replace("http", "ws", 1) + "/ws/odds"
+    api_url = base_url + "/api"
+
+    try:
+        async with httpx.AsyncClient(
+            base_url=base_url, headers=headers, timeout=30
+        ) as http:
+            await wait_until_up(http)
+            rss_before = rss_kb(process.pid) if process else None
+
+            # connect everyone, a batch at a time
+            stop = asyncio.Event()
+            slow_count = int(args.clients * args.slow_pct / 100)
+            subscribers = [
+                Subscriber(
+                    i,
+                    random.choice(args.origins),
+                    args.slow_delay if i < slow_count else 0,
+                    args.slow_queue if i < slow_count else None,
+                    args.slow_rcvbuf if i < slow_count else None,
+                )
+                for i in range(args.clients)
+            ]
+            tasks = []
+            for start in range(0, len(subscribers), args.connect_batch):
+                batch = subscribers[start : start + args.connect_batch]
+                events = [asyncio.Event() for _ in batch]
+                for subscriber, event in zip(batch, events):
+                    tasks.append(
+                        asyncio.create_task(subscriber.run(ws_url, event, stop))
+                    )
+                await asyncio.gather(*(event.wait() for event in events))
+            connected = [s for s in subscribers if s.error is None]
+            await asyncio.sleep(0.5)
+            rss_after = rss_kb(process.pid) if process else None
+
+            # a warm-up notification tells us the sequence number to start from
+            async with httpx.AsyncClient(base_url=api_url, timeout=30) as api:
+                await notify(api, args.game_id)
+                deadline = time.monotonic() + 10
+                while time.monotonic() < deadline and not any(
+                    s.received for s in connected
+                ):
+                    await asyncio.sleep(0.05)
+                seen = [seq for s in connected for seq in s.received]
+                if not seen:
+                    raise RuntimeError("No client received the warm-up update")
+                base_seq = max(seen)
+
+                # fire notifications at a steady rate
+                sent_at: Dict[int, float] = {}
+                interval = 1 / args.rate
+                started = time.monotonic()
+                for i in range(args.notifications):
+                    target = started + i * interval
+                    await asyncio.sleep(max(0, target - time.monotonic()))
+                    sent_at[base_seq + 1 + i] = time.monotonic()
+                    await notify(api, args.game_id)
+
+            await asyncio.sleep(args.drain)
+            elapsed = time.monotonic() - started
+            response = await http.get(STATS_PATH)
+            stats = response.json() if response.status_code == 200 else None
+            stop.set()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    latencies = [
+        (received - sent_at[seq]) * 1000
+        for s in connected
+        for seq, received in s.received.items()
+        if seq in sent_at
+    ]
+    expected = len(connected) * args.notifications
+
+    def delivery(group: List[Subscriber]) -> Dict:
+        delivered = sum(1 for s in group for seq in s.received if seq in sent_at)
+        return {
+            "clients": len(group),
+            "frames_delivered": delivered,
+            "frames_missed": len(group) * args.notifications - delivered,
+            "resyncs": sum(s.resyncs for s in group),
+            "dropped_by_server": sum(1 for s in group if s.dropped),
+        }
+
+    report = {
+        "clients": args.clients,
+        "connected": len(connected),
+        "connect_errors": args.clients - len(connected),
+        "slow_clients": slow_count,
+        "notifications": args.notifications,
+        "frames_delivered": len(latencies),
+        "frames_expected": expected,
+        "delivery_ratio": len(latencies) / expected if expected else 0,
+        "throughput_frames_per_sec": len(latencies) / elapsed if elapsed else 0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies, default=0),
+        },
+        "resyncs": sum(s.resyncs for s in subscribers),
+        "fast": delivery([s for s in connected if not s.slow_delay]),
+        "slow": delivery([s for s in connected if s.slow_delay]),
+        "server": stats,
+    }
+    if rss_before is not None and rss_after is not None and connected:
+        report["memory_per_connection_kb"] = (rss_after - rss_before) / len(connected)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument(
+        "--spawn", action="store_true", help="start uvicorn against DATABASE_URL"
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--game-id", required=True, help="game_id of a game in the db")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--connect-batch", type=int, default=200)
+    parser.add_argument(
+        "--origins", nargs="+", default=DEFAULT_ORIGINS, help="Origin headers to use"
+    )
+    parser.add_argument(
+        "--slow-pct", type=float, default=0, help="percent of clients that read slowly"
+    )
+    parser.add_argument(
+        "--slow-delay",
+        type=float,
+        default=0.5,
+        help="seconds a slow client waits per frame",
+    )
+    parser.add_argument(
+        "--slow-queue",
+        type=int,
+        default=4,
+        help="frames a slow client buffers before pushing back",
+    )
+    parser.add_argument(
+        "--slow-rcvbuf",
+        type=int,
+        default=4096,
+        help="socket receive buffer of a slow client, in bytes",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=5, help="notifications per second"
+    )
+    parser.add_argument("--notifications", type=int, default=50)
+    parser.add_argument(
+        "--drain", type=float, default=2, help="seconds to wait for stragglers"
+    )
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Tests run against a throwaway Postgres database given in TEST_DATABASE_URL,
+eg. postgresql://postgres@localhost/courtside_test. Its tables are dropped
+and recreated. Tests that need it are skipped when it isn't set.
+
+    TEST_DATABASE_URL=... python -m pytest -q
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+# set before the app is imported (and loads .env), so the app never points at
+# a real database. Without a test database nothing connects to this one
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL or "postgresql://localhost/unused"
+os.environ.setdefault("SECRET", "test")
+# single process, no LISTEN connection
+os.environ["ODDS_BUS"] = "memory"
+
+import pytest
+from sqlalchemy import text
+
+# every table, including the ones only init_db used to create
+import app.models.bet
+import app.models.game
+import app.models.odds_history
+import app.models.settlement_job
+import app.models.user
+
+
+@pytest.fixture(scope="session")
+def database():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from app.db.base import Base
+    from app.db.session import engine
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # games.game_date is a timestamp in production
+        conn.execute(text("ALTER TABLE games ALTER COLUMN game_date TYPE timestamp"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(database):
+    """A session on the test database, emptied after each test"""
+    from app.db.base import Base
+    from app.db.session import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.close()
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with database.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    """The app with its lifespan running, on one event loop for the session"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+class BoxscoreCDN:
+    """Local stand-in for the NBA CDN's boxscore JSON. Games that haven't
+    been given a score are 404s"""
+
+    def __init__(self):
+        # game_id -> (gameStatus, home score, away score)
+        self.games = {}
+        self.requests = 0
+        self.url = None
+
+    def set_game(self, game_id: str, status: int, home: int, away: int):
+        self.games[game_id] = (status, home, away)
+
+    async def boxscore(self, request):
+        from aiohttp import web
+
+        self.requests += 1
+        game_id = request.match_info["game_id"]
+        if game_id not in self.games:
+            raise web.HTTPNotFound()
+        status, home, away = self.games[game_id]
+
+        def team(team_id, score):
+            return {
+                "teamId": team_id,
+                "teamName": "Team",
+                "teamCity": "City",
+                "teamTricode": "TTT",
+                "score": score,
+                # the real thing carries full box scores, which get skipped
+                "players": [{"personId": i, "statistics": {}} for i in range(13)],
+            }
+
+        return web.json_response(
+            {
+                "meta": {"version": 1},
+                "game": {
+                    "gameId": game_id,
+                    "gameStatus": status,
+                    "homeTeam": team(1, home),
+                    "awayTeam": team(2, away),
+                },
+            }
+        )
+
+
+@pytest.fixture(scope="session")
+def cdn_server():
+    """A BoxscoreCDN served on its own thread and loop for the session"""
+    import asyncio
+    import threading
+    from aiohttp import web
+
+    cdn = BoxscoreCDN()
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_get(
+        "/static/json/liveData/boxscore/boxscore_{game_id}.json", cdn.boxscore
+    )
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    cdn.url = f"http://127.0.0.1:{port}"
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield cdn
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.run_until_complete(runner.cleanup())
+    loop.close()
+
+
+@pytest.fixture
+def cdn(cdn_server, monkeypatch):
+    """The CDN stand-in, with the app's boxscore client pointed at it"""
+    from app.core.boxscore import boxscore_client
+
+    monkeypatch.setattr(boxscore_client, "base_url", cdn_server.url)
+    # no scores or validators left over from another test
+    boxscore_client._cache.clear()
+    cdn_server.games.clear()
+    yield cdn_server
@@ -0,0 +1,110 @@
+from decimal import Decimal
+from datetime import datetime
+import pytest
+from sqlalchemy import func, select
+from app.db.async_session import AsyncSessionLocal, get_async_db, to_async_url
+from app.models.game import Game
+from app.models.odds_history import OddsHistory
+from app.models.user import User
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("postgres://u:p@host/db", "postgresql+asyncpg://u:p@host/db"),
+        ("postgresql://u:p@host/db", "postgresql+asyncpg://u:p@host/db"),
+        ("postgresql+psycopg2://u:p@host/db", "postgresql+asyncpg://u:p@host/db"),
+        (
+            "postgresql://u:p@host/db?sslmode=require",
+            "postgresql+asyncpg://u:p@host/db?ssl=require",
+        ),
+    ],
+)
+def test_to_async_url(url, expected):
+    assert to_async_url(url).render_as_string(hide_password=False) == expected
+
+
+def test_get_async_db_commits(client, db):
+    async def scenario():
+        session = get_async_db()
+        async_db = await session.__anext__()
+        async_db.add(User(username="committed", password="x"))
+        with pytest.raises(StopAsyncIteration):
+            await session.__anext__()
+
+    # on the app's own loop, where the async engine's connections live
+    client.portal.call(scenario)
+    assert db.scalar(select(func.count()).where(User.username == "committed")) == 1
+
+
+def test_get_async_db_rolls_back_on_error(client, db):
+    async def scenario():
+        session = get_async_db()
+        async_db = await session.__anext__()
+        async_db.add(User(username="rolled-back", password="x"))
+        await async_db.flush()
+        with pytest.raises(RuntimeError):
+            await session.athrow(RuntimeError("handler failed"))
+
+    client.portal.call(scenario)
+    assert db.scalar(select(func.count()).where(User.username == "rolled-back")) == 0
+
+
+def test_sync_crud_through_run_sync(client, db):
+    from app.crud.user import UserCRUD
+
+    db.add(User(username="Mixed.Case", password="x"))
+    db.commit()
+
+    async def scenario():
+        async with AsyncSessionLocal() as async_db:
+            return await async_db.run_sync(UserCRUD.get_user_by_username, "mixed.case")
+
+    user = client.portal.call(scenario)
+    assert user.username == "Mixed.Case"
+
+
+def test_register_and_login(client, db):
+    credentials = {"username": "bettor", "password": "hunter22"}
+    registered = client.post("/api/auth/register", json=credentials)
+    assert registered.status_code == 200
+    assert registered.json()["user"]["username"] == "bettor"
+
+    assert client.post("/api/auth/register", json=credentials).status_code == 400
+
+    login = client.post("/api/auth/login", json=credentials)
+    assert login.status_code == 200
+    token = login.json()["token"]
+    me = client.get(
+        "/api/auth/verify-token", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert me.json()["username"] == "bettor"
+
+    wrong = client.post(
+        "/api/auth/login", json={"username": "bettor", "password": "wrong"}
+    )
+    assert wrong.status_code == 401
+
+
+def test_notify_odds_update_records_history(client, db):
+    db.add(
+        Game(
+            game_id="0022400123",
+            home_team="Orlando Magic",
+            away_team="Boston Celtics",
+            game_date=datetime(2025, 4, 15),
+            opening_home_spread=Decimal("-3.5"),
+            opening_over_under=Decimal("215.5"),
+            home_spread=Decimal("-4.5"),
+        )
+    )
+    db.commit()
+
+    response = client.post("/api/notify-odds-update", json={"gameId": "0022400123"})
+    assert response.status_code == 200
+    # committed by the handler, so visible to another connection
+    assert db.scalar(select(func.count()).select_from(OddsHistory)) == 1
+    assert db.scalar(select(OddsHistory.home_spread)) == Decimal("-4.5")
+
+    missing = client.post("/api/notify-odds-update", json={"gameId": "missing"})
+    assert missing.status_code == 404
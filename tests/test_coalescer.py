@@ -0,0 +1,60 @@
+import asyncio
+from app.websockets.coalescer import NotificationCoalescer
+
+
+def test_merges_a_burst_into_one_flush():
+    async def scenario():
+        coalescer = NotificationCoalescer(window_ms=50)
+        flushes = []
+
+        async def flush():
+            flushes.append("game")
+
+        merged = [coalescer.submit("game", flush) for _ in range(5)]
+        await asyncio.sleep(0.2)
+        return merged, flushes, coalescer.stats()
+
+    merged, flushes, stats = asyncio.run(scenario())
+    assert merged == [False, True, True, True, True]
+    assert flushes == ["game"]
+    assert (stats["received"], stats["merged"], stats["flushed"]) == (5, 4, 1)
+
+
+def test_aclose_flushes_open_windows():
+    async def scenario():
+        # a window far longer than the test
+        coalescer = NotificationCoalescer(window_ms=60_000)
+        flushes = []
+
+        async def flush(key):
+            flushes.append(key)
+
+        for key in ("a", "b", "a"):
+            coalescer.submit(key, lambda key=key: flush(key))
+        started = asyncio.get_running_loop().time()
+        await coalescer.aclose()
+        return flushes, asyncio.get_running_loop().time() - started, coalescer
+
+    flushes, seconds, coalescer = asyncio.run(scenario())
+    assert sorted(flushes) == ["a", "b"]
+    assert seconds < 1
+    assert coalescer.stats()["pending"] == 0
+
+
+def test_aclose_cancels_flushes_that_hang():
+    async def scenario():
+        coalescer = NotificationCoalescer(window_ms=60_000, close_timeout=0.1)
+        cancelled = []
+
+        async def flush():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        coalescer.submit("game", flush)
+        await coalescer.aclose()
+        return cancelled
+
+    assert asyncio.run(scenario()) == [True]
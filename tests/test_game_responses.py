@@ -0,0 +1,180 @@
+from decimal import Decimal
+from datetime import datetime
+from sqlalchemy import update
+from app.models.game import Game
+
+
+def add_games(db, count: int = 5):
+    db.add_all(
+        Game(
+            game_id=f"00224001{i:02d}",
+            home_team=f"Home {i}",
+            away_team=f"Away {i}",
+            game_date=datetime(2025, 4, 15),
+            opening_home_spread=Decimal("-3.5"),
+            opening_over_under=Decimal("215.5"),
+            home_spread=Decimal("-3.5"),
+        )
+        for i in range(count)
+    )
+    db.commit()
+
+
+def test_cache_headers_and_not_modified(client, db):
+    add_games(db)
+
+    response = client.get("/api/games", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert "Content-Encoding" not in response.headers
+    etag = response.headers["ETag"]
+    assert etag.startswith('"') and etag.endswith('"')
+    assert len(response.json()) == 5
+
+    not_modified = client.get(
+        "/api/games",
+        headers={"Accept-Encoding": "identity", "If-None-Match": etag},
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert not_modified.content == b""
+
+
+def test_gzip_variant_has_its_own_etag(client, db):
+    add_games(db)
+    identity = client.get("/api/games", headers={"Accept-Encoding": "identity"})
+
+    gzipped = client.get("/api/games", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.status_code == 200
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzipped.headers["Vary"] == "Accept-Encoding"
+    # decompressed by the client, same document
+    assert gzipped.json() == identity.json()
+    assert gzipped.headers["ETag"] != identity.headers["ETag"]
+
+    assert (
+        client.get(
+            "/api/games",
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": gzipped.headers["ETag"],
+            },
+        ).status_code
+        == 304
+    )
+    # the identity tag doesn't validate the gzip body
+    assert (
+        client.get(
+            "/api/games",
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": identity.headers["ETag"],
+            },
+        ).status_code
+        == 200
+    )
+
+
+def test_odds_notification_invalidates_cached_body(client, db):
+    add_games(db)
+    first = client.get("/api/games", headers={"Accept-Encoding": "identity"})
+    etag = first.headers["ETag"]
+
+    # the scraper writes odds without touching updated_at, then notifies
+    db.execute(
+        update(Game)
+        .where(Game.game_id == "0022400100")
+        .values(home_spread=Decimal("-5.5"), updated_at=Game.updated_at)
+    )
+    db.commit()
+    assert (
+        client.post("/api/notify-odds-update", json={"gameId": "0022400100"})
+    ).status_code == 200
+
+    second = client.get(
+        "/api/games", headers={"Accept-Encoding": "identity", "If-None-Match": etag}
+    )
+    assert second.status_code == 200
+    assert second.headers["ETag"] != etag
+    spreads = {game["gameId"]: game["homeSpread"] for game in second.json()}
+    assert spreads["0022400100"] == "-5.50"
+
+
+def test_games_by_date_not_modified(client, db):
+    add_games(db, 2)
+    response = client.get("/api/games/date/2025-04-15")
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert (
+        client.get(
+            "/api/games/date/2025-04-15",
+            headers={"If-None-Match": response.headers["ETag"]},
+        ).status_code
+        == 304
+    )
+
+
+class Clock(datetime):
+    """datetime whose now() is whatever the test sets"""
+
+    current = None
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current.astimezone(tz)
+
+
+def test_today_etag_follows_the_slate_rollover(client, db, monkeypatch):
+    from app.core.cache import todays_odds_cache
+    from app.crud.game import EASTERN
+
+    for i, day in enumerate((15, 16)):
+        db.add(
+            Game(
+                game_id=f"00224002{i:02d}",
+                home_team=f"Home {i}",
+                away_team=f"Away {i}",
+                game_date=datetime(2025, 4, day),
+                opening_home_spread=Decimal("-3.5"),
+                opening_over_under=Decimal("215.5"),
+            )
+        )
+    db.commit()
+    monkeypatch.setattr("app.crud.game.datetime", Clock)
+    monkeypatch.setattr("app.core.cache.datetime", Clock)
+    # nothing left over from a slate loaded on the real clock
+    todays_odds_cache.invalidate()
+
+    def games(response):
+        return sum(len(slate) for slate in response.json().values())
+
+    # before 2 AM Eastern the 15th's games are still today's
+    Clock.current = EASTERN.localize(datetime(2025, 4, 16, 1, 30))
+    for _ in range(2):
+        # the second is served from the cached slate
+        before = client.get("/api/games/today", headers={"Accept-Encoding": "identity"})
+        assert games(before) == 2
+
+    Clock.current = EASTERN.localize(datetime(2025, 4, 16, 2, 30))
+    after = client.get(
+        "/api/games/today",
+        headers={
+            "Accept-Encoding": "identity",
+            "If-None-Match": before.headers["ETag"],
+        },
+    )
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert games(after) == 1
+
+    assert (
+        client.get(
+            "/api/games/today",
+            headers={
+                "Accept-Encoding": "identity",
+                "If-None-Match": after.headers["ETag"],
+            },
+        ).status_code
+        == 304
+    )
@@ -0,0 +1,140 @@
+from decimal import Decimal
+import logging
+import random
+import pytest
+from app.core import grading
+from app.crud.bet import BetCRUD
+from app.models.bet import Bet, BetType
+from app.models.user import User
+
+USERS = 40
+
+
+class UserLookup:
+    """Just enough of a Session for process_bet, which only looks up the
+    bet's user"""
+
+    def __init__(self, users):
+        self.users = users
+
+    def query(self, model):
+        return self
+
+    def filter(self, clause):
+        # User.id == bet.user_id
+        self.user = self.users[clause.right.value]
+        return self
+
+    def first(self):
+        return self.user
+
+
+def make_bets(n: int, home: int, away: int, rng: random.Random):
+    margin, total = home - away, home + away
+    bets = []
+    for i in range(n):
+        bet_type = rng.choice(list(BetType))
+        if bet_type in (BetType.SPREAD_HOME, BetType.SPREAD_AWAY):
+            side = margin if bet_type == BetType.SPREAD_HOME else -margin
+            # on, either side of and mirroring the margin, plus odd hundredths
+            line = Decimal(
+                rng.choice(
+                    [-side, side, -side - 0.5, -side + 0.5, 0, 3.5, -7, -0.25, 0.01]
+                )
+            ).quantize(Decimal("0.01"))
+        elif bet_type in (BetType.OVER, BetType.UNDER):
+            # on the total is a push
+            line = Decimal(
+                rng.choice([total, total - 0.5, total + 0.5, total + 0.01, 215.5])
+            ).quantize(Decimal("0.01"))
+        else:
+            line = rng.choice([None, Decimal(0)])
+        amount = Decimal(rng.randint(1, 50000)).scaleb(-2)
+        payout = (amount * Decimal(rng.choice(["1.91", "2.50", "1.4545"]))).quantize(
+            Decimal("0.01")
+        )
+        bets.append(
+            Bet(
+                id=i,
+                user_id=rng.randint(1, USERS),
+                game_id=1,
+                bet_type=bet_type,
+                odds=Decimal(-110),
+                amount_placed=amount,
+                total_payout=payout,
+                status="PENDING",
+                betting_line=line,
+            )
+        )
+    return bets
+
+
+@pytest.mark.parametrize(
+    "home, away", [(112, 105), (98, 104), (101, 101), (120, 95), (100, 99)]
+)
+def test_grade_matches_process_bet(home, away):
+    rng = random.Random(home * 1000 + away)
+    bets = make_bets(3000, home, away, rng)
+    rows = [
+        (
+            bet.user_id,
+            bet.bet_type,
+            (
+                grading.to_hundredths(bet.betting_line)
+                if bet.betting_line is not None
+                else None
+            ),
+            grading.to_hundredths(bet.amount_placed),
+            grading.to_hundredths(bet.total_payout),
+        )
+        for bet in bets
+    ]
+
+    users = {
+        i: User(id=i, username=f"u{i}", balance=0, amount_won=0, bets_won=0)
+        for i in range(1, USERS + 1)
+    }
+    db = UserLookup(users)
+    home_team = {"teamCity": "Home", "teamName": "Team", "score": home}
+    away_team = {"teamCity": "Away", "teamName": "Team", "score": away}
+    # process_bet logs every bet
+    logging.disable(logging.INFO)
+    try:
+        for bet in bets:
+            BetCRUD.process_bet(db, bet, home_team, away_team)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    outcome = grading.grade(grading.BetColumns.from_rows(rows), home, away)
+    assert [grading.STATUSES[code] for code in outcome] == [bet.status for bet in bets]
+    assert {bet.status for bet in bets} == {"WON", "LOST", "PUSH"}
+
+    credits = grading.credit_totals(grading.BetColumns.from_rows(rows), outcome)
+    assert {
+        int(user_id): (
+            grading.from_hundredths(amount_won),
+            int(bets_won),
+            grading.from_hundredths(credit),
+        )
+        for user_id, amount_won, bets_won, credit in zip(
+            credits.user_id, credits.amount_won, credits.bets_won, credits.credit
+        )
+    } == {
+        user.id: (user.amount_won, user.bets_won, user.balance)
+        for user in users.values()
+        if user.bets_won or user.balance
+    }
+
+
+def test_bets_without_a_line_stay_pending():
+    rows = [
+        (1, BetType.SPREAD_HOME, None, 100, 200),
+        (1, BetType.OVER, None, 100, 200),
+        (1, BetType.MONEYLINE_HOME, None, 100, 200),
+    ]
+    outcome = grading.grade(grading.BetColumns.from_rows(rows), 100, 90)
+    assert [grading.STATUSES[code] for code in outcome] == [
+        "PENDING",
+        "PENDING",
+        "WON",
+    ]
@@ -0,0 +1,24 @@
+import pytest
+
+PATHS = [
+    "/api/internal/stats/websocket",
+    "/api/internal/stats/notify-odds",
+    "/api/internal/stats/todays-odds-cache",
+    "/api/internal/stats/password-hashing",
+]
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_stats_need_the_internal_token(client, monkeypatch, path):
+    # off entirely until a token is configured
+    assert client.get(path).status_code == 404
+
+    monkeypatch.setattr("app.core.auth.INTERNAL_API_TOKEN", "s3cret")
+    assert client.get(path).status_code == 401
+    assert (
+        client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    )
+    response = client.get(path, headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert isinstance(response.json(), dict)
+
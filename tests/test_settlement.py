@@ -0,0 +1,179 @@
+from decimal import Decimal
+from datetime import datetime
+import time
+from sqlalchemy import update
+from app.models.bet import Bet
+from app.models.game import Game
+from app.models.user import User
+
+GAME_DATE = datetime(2025, 4, 15)
+
+
+def add_game(db, game_id: str, user: User, bet_type: str, line=None) -> Game:
+    game = Game(
+        game_id=game_id,
+        home_team=f"Home {game_id}",
+        away_team=f"Away {game_id}",
+        game_date=GAME_DATE,
+        opening_home_spread=Decimal("-3.5"),
+        opening_over_under=Decimal("215.5"),
+    )
+    db.add(game)
+    db.flush()
+    db.add(
+        Bet(
+            user_id=user.id,
+            game_id=game.id,
+            bet_type=bet_type,
+            odds=Decimal(100),
+            amount_placed=Decimal(10),
+            total_payout=Decimal(20),
+            betting_line=line,
+            status="PENDING",
+            placed_at=GAME_DATE,
+        )
+    )
+    return game
+
+
+def wait_for_jobs(client, job_ids, timeout: float = 15):
+    """Poll the jobs until none is queued or running"""
+    deadline = time.monotonic() + timeout
+    while True:
+        jobs = {
+            job_id: client.get(f"/api/games/settlement-jobs/{job_id}").json()
+            for job_id in job_ids
+        }
+        if all(job["status"] not in ("QUEUED", "RUNNING") for job in jobs.values()):
+            return jobs
+        assert time.monotonic() < deadline, jobs
+        time.sleep(0.1)
+
+
+def test_settle_date_queues_a_job_per_game(client, db, cdn):
+    user = User(username="bettor", password="x", balance=Decimal(100))
+    db.add(user)
+    db.flush()
+    add_game(db, "won", user, "MONEYLINE_HOME")
+    add_game(db, "push", user, "OVER", Decimal(210))
+    add_game(db, "live", user, "MONEYLINE_AWAY")
+    add_game(db, "missing", user, "MONEYLINE_AWAY")
+    db.commit()
+    cdn.set_game("won", 3, 110, 100)
+    cdn.set_game("push", 3, 110, 100)
+    cdn.set_game("live", 2, 50, 48)
+
+    response = client.post("/api/games/date/2025-04-15/process")
+    assert response.status_code == 202
+    body = response.json()
+    assert body["gameDate"] == "2025-04-15"
+    queued = {game["game_id"]: game for game in body["games"]}
+    assert set(queued) == {"won", "push", "live", "missing"}
+    assert {game["job_status"] for game in queued.values()} == {"QUEUED"}
+
+    jobs = wait_for_jobs(client, [game["job_id"] for game in queued.values()])
+    by_game = {job["gameId"]: job for job in jobs.values()}
+    assert by_game["won"]["status"] == "SUCCEEDED"
+    assert (by_game["won"]["won"], by_game["won"]["paidOut"]) == (1, "20.00")
+    assert by_game["push"]["status"] == "SUCCEEDED"
+    assert by_game["push"]["push"] == 1
+    assert by_game["live"]["status"] == "NOT_ENDED"
+    assert by_game["missing"]["status"] == "FAILED"
+
+    # the whole slate's results from one call
+    slate = client.get("/api/games/date/2025-04-15/settlement").json()
+    assert slate["gameDate"] == "2025-04-15"
+    assert {game["gameId"]: game["status"] for game in slate["games"]} == {
+        game_id: job["status"] for game_id, job in by_game.items()
+    }
+    assert sum(game["bets"] for game in slate["games"]) == 2
+
+    db.expire_all()
+    # payout for the win, stake back for the push
+    assert db.get(User, user.id).balance == Decimal(130)
+    statuses = dict(
+        db.query(Game.game_id, Bet.status).join(Bet, Bet.game_id == Game.id).all()
+    )
+    assert statuses == {
+        "won": "WON",
+        "push": "PUSH",
+        "live": "PENDING",
+        "missing": "PENDING",
+    }
+
+    # settled games drop out, the rest are queued again under the same jobs
+    again = client.post("/api/games/date/2025-04-15/process").json()["games"]
+    assert {game["game_id"]: game["job_id"] for game in again} == {
+        "live": queued["live"]["job_id"],
+        "missing": queued["missing"]["job_id"],
+    }
+    wait_for_jobs(client, [game["job_id"] for game in again])
+
+
+def test_settle_single_game(client, db, cdn):
+    user = User(username="bettor", password="x", balance=Decimal(0))
+    db.add(user)
+    db.flush()
+    add_game(db, "lost", user, "MONEYLINE_AWAY")
+    db.commit()
+    cdn.set_game("lost", 3, 110, 100)
+
+    response = client.post("/api/games/lost/process")
+    assert response.status_code == 202
+    job = wait_for_jobs(client, [response.json()["job_id"]])
+    assert list(job.values())[0]["lost"] == 1
+
+    # asking again returns the finished job
+    again = client.post("/api/games/lost/process").json()
+    assert (again["job_id"], again["job_status"]) == (
+        response.json()["job_id"],
+        "SUCCEEDED",
+    )
+
+
+def test_settle_errors(client, db):
+    assert client.post("/api/games/nope/process").status_code == 404
+    assert client.get("/api/games/settlement-jobs/12345").status_code == 404
+    assert client.post("/api/games/date/15-04-2025/process").status_code == 400
+    assert client.get("/api/games/date/15-04-2025/settlement").status_code == 400
+    assert client.get("/api/games/date/2025-04-15/settlement").json()["games"] == []
+
+
+def test_ungradable_bet_fails_the_job(client, db, cdn):
+    user = User(username="bettor", password="x", balance=Decimal(0))
+    db.add(user)
+    db.flush()
+    game = add_game(db, "noline", user, "SPREAD_HOME")
+    db.add(
+        Bet(
+            user_id=user.id,
+            game_id=game.id,
+            bet_type="MONEYLINE_HOME",
+            odds=Decimal(100),
+            amount_placed=Decimal(10),
+            total_payout=Decimal(20),
+            status="PENDING",
+            placed_at=GAME_DATE,
+        )
+    )
+    db.commit()
+    cdn.set_game("noline", 3, 110, 100)
+
+    job_id = client.post("/api/games/noline/process").json()["job_id"]
+    job = wait_for_jobs(client, [job_id])[job_id]
+    # the moneyline is graded, the spread without a line isn't
+    assert job["status"] == "FAILED"
+    assert job["error"].startswith("1 pending bets could not be graded")
+    assert (job["bets"], job["won"]) == (1, 1)
+
+    # once it has a line, settling again grades it
+    db.execute(
+        update(Bet)
+        .where(Bet.game_id == game.id, Bet.status == "PENDING")
+        .values(betting_line=Decimal("-5.5"))
+    )
+    db.commit()
+    assert client.post("/api/games/noline/process").json()["job_id"] == job_id
+    job = wait_for_jobs(client, [job_id])[job_id]
+    assert job["status"] == "SUCCEEDED"
+    assert (job["bets"], job["won"]) == (2, 2)
@@ -0,0 +1,25 @@
+ORIGIN = {"origin": "http://localhost:3000"}
+GAME = {"id": 999, "gameId": "0022400999", "gameDate": "2025-04-15"}
+
+
+def test_ping_only_reaches_clients_on_the_new_protocol(client):
+    from app.api.v1.endpoints.websocket import odds_manager
+
+    with client.websocket_connect(
+        "/ws/odds", headers=ORIGIN
+    ) as legacy, client.websocket_connect(
+        "/ws/odds?mode=delta", headers=ORIGIN
+    ) as delta, client.websocket_connect(
+        "/ws/odds", headers=ORIGIN
+    ) as subscriber:
+        assert delta.receive_json()["type"] == "SNAPSHOT"
+        subscriber.send_json({"action": "subscribe", "gameIds": [GAME["gameId"]]})
+        assert subscriber.receive_json()["type"] == "SUBSCRIPTIONS"
+
+        client.portal.call(odds_manager._send_pings)
+        client.portal.call(odds_manager.broadcast_odds_update, GAME["gameId"], GAME)
+
+        assert delta.receive_json()["type"] == "PING"
+        assert subscriber.receive_json()["type"] == "PING"
+        # the original frontend only ever sees odds frames
+        assert legacy.receive_json()["type"] == "ODDS_UPDATE"